@@ -0,0 +1,30 @@
+import pytest
+
+from xled_plus.emulator import Emulator, connect
+
+
+@pytest.fixture
+def make_emulator():
+    """
+    Returns a function starting an emulated device with the given options.
+    The devices are stopped after the test.
+    """
+    emus = []
+
+    def make(**kwargs):
+        emu = Emulator(**kwargs).start()
+        emus.append(emu)
+        return emu
+
+    yield make
+    for emu in emus:
+        emu.stop()
+
+
+@pytest.fixture
+def make_ctr(make_emulator):
+    """
+    Returns a function starting an emulated device with the given options
+    and connecting to it.
+    """
+    return lambda **kwargs: connect(make_emulator(**kwargs).host)
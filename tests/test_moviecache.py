@@ -0,0 +1,45 @@
+from xled_plus.moviecache import MovieCache
+from xled_plus.moviefile import MovieSegment
+from xled_plus.sequence import Sequence
+from xled_plus.shapes import Blob, Scene
+
+
+def redgreen(pos):
+    return (255, 0, 0) if pos % 1.0 < 0.5 else (0, 255, 0)
+
+
+def test_key_follows_state_after_init(make_ctr, tmp_path):
+    ctr = make_ctr(leds=50, dim=2)
+    cache = MovieCache(str(tmp_path))
+    scene = Scene(ctr)
+    empty = cache.key(scene, 10)
+    scene.add_shape(Blob((0.0, 0.0), 0.4, (255, 0, 0)))
+    red = cache.key(scene, 10)
+    scene.shapes[0].color = (0, 0, 255)
+    assert len(set([empty, red, cache.key(scene, 10)])) == 3
+    seq = Sequence(ctr, redgreen, 1.0, 1.0)
+    before = cache.key(seq, 10)
+    seq.set_vector((0.5, 0.0))
+    assert cache.key(seq, 10) != before
+
+
+def test_key_follows_adjusted_layout(make_ctr, tmp_path):
+    ctr = make_ctr(leds=50, dim=2)
+    cache = MovieCache(str(tmp_path))
+    seq = Sequence(ctr, redgreen, 1.0, 1.0)
+    before = cache.key(seq, 10)
+    ctr.adjust_layout_aspect(2.0)
+    assert cache.key(seq, 10) != before
+
+
+def test_repeated_movie_is_found(make_ctr, tmp_path):
+    ctr = make_ctr(leds=50, dim=2)
+    scene = Scene(ctr)
+    scene.movie_cache = MovieCache(str(tmp_path))
+    scene.add_shape(Blob((0.0, 0.0), 0.4, (255, 0, 0)))
+    scene.shapes[0].speed = (0.02, 0.0)
+    first = scene.cached_movie(10).getvalue()
+    second = scene.cached_movie(10)
+    assert isinstance(second, MovieSegment)  # read from the cache file
+    assert second.getvalue() == first
+    second.close()
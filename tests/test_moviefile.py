@@ -0,0 +1,58 @@
+import os
+
+from xled_plus.emulator import connect
+from xled_plus.moviefile import MovieFile, write_movie_file
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def write_movie(ctr, name, num_leds, numframes=4):
+    data = bytes(range(256)) * (num_leds * ctr.led_bytes * numframes // 256 + 1)
+    movie = ctr.to_movie(data[: num_leds * ctr.led_bytes * numframes])
+    write_movie_file(name, movie, num_leds, ctr.led_bytes, 10)
+    return movie.getvalue()
+
+
+def test_loaded_movie_closes_file(make_ctr, tmp_path):
+    ctr = make_ctr(leds=30)
+    name = str(tmp_path / "movie.xmov")
+    data = write_movie(ctr, name, 30)
+    before = open_fds()
+    movie, fps = ctr.load_movie(name)
+    assert fps == 10
+    assert movie.getvalue() == data
+    assert open_fds() > before
+    movie.close()
+    assert open_fds() == before
+
+
+def test_converted_movie_closes_file(make_ctr, tmp_path):
+    ctr = make_ctr(leds=30)
+    name = str(tmp_path / "movie.xmov")
+    write_movie(ctr, name, 20)
+    before = open_fds()
+    movie, fps = ctr.load_movie(name)
+    assert len(movie.getvalue()) == 4 * 30 * ctr.led_bytes
+    assert open_fds() == before
+
+
+def test_close_with_views_in_use(make_ctr, tmp_path):
+    ctr = make_ctr(leds=30)
+    name = str(tmp_path / "movie.xmov")
+    data = write_movie(ctr, name, 30)
+    mf = MovieFile(name)
+    frame = mf.frame(1)
+    mf.close()
+    assert bytes(frame) == data[90:180]
+
+
+def test_layout_hash_follows_fetched_layout(make_emulator):
+    emu = make_emulator(leds=30, dim=2)
+    ctr = connect(emu.host)
+    old = ctr.layout_hash()
+    emu.device.layout = [dict(p, x=-p["x"]) for p in emu.device.layout]
+    assert ctr.layout_hash() == old
+    ctr.fetch_layout()
+    assert ctr.layout_hash() != old
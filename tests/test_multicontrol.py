@@ -0,0 +1,33 @@
+import time
+
+from xled_plus.emulator import connect, start_group
+
+
+def test_parallel_upload_returns_id_of_last_device():
+    emus = start_group(3, leds=20)
+    try:
+        ctr = connect([emu.host for emu in emus], parallel=True)
+        # Make the movie ids of the last device differ from the others
+        last = emus[-1].device
+        last.next_id += 5
+        movie = ctr.to_movie(ctr.make_solid_pattern((10, 20, 30)))
+        assert ctr.upload_movie(movie, 10, "test", force=True) == last.next_id - 1
+        assert ctr.pool is not None
+        ctr.close()
+        assert ctr.pool is None
+    finally:
+        for emu in emus:
+            emu.stop()
+
+
+def test_real_time_burst_reaches_every_device():
+    emus = start_group(3, leds=20)
+    try:
+        ctr = connect([emu.host for emu in emus], parallel=True)
+        ctr.show_rt_frame(ctr.make_solid_pattern((10, 20, 30)))
+        time.sleep(0.3)
+        assert [emu.device.stats()["rt_frames"] for emu in emus] == [1, 1, 1]
+        ctr.close()
+    finally:
+        for emu in emus:
+            emu.stop()
@@ -0,0 +1,29 @@
+import pytest
+
+from xled_plus.effect_base import Effect
+
+
+class Solid(Effect):
+    def __init__(self, ctr, num_leds):
+        super(Solid, self).__init__(ctr)
+        self.num_leds = num_leds
+
+    def reset(self, numframes):
+        self.count = 0
+
+    def getnext(self):
+        self.count += 1
+        return bytes([self.count]) * (self.num_leds * self.ctr.led_bytes)
+
+
+def test_effect_movie_is_movie(make_ctr):
+    ctr = make_ctr(leds=10)
+    movie = Solid(ctr, 10).make_movie(5)
+    assert ctr.is_movie(movie)
+    assert movie.getvalue() == b"".join(bytes([i]) * 30 for i in range(1, 6))
+
+
+def test_wrong_frame_size_is_refused(make_ctr):
+    ctr = make_ctr(leds=10)
+    with pytest.raises(AssertionError):
+        Solid(ctr, 9).make_movie(5)
@@ -0,0 +1,75 @@
+import random
+import time
+
+from xled_plus.effect_base import Effect
+from xled_plus.effects import Gold
+from xled_plus.rtscheduler import RealtimeScheduler
+
+
+class Counter(Effect):
+    """
+    Sets all leds to the frame number, updating one frame in place.
+    """
+
+    def reset(self, numframes):
+        self.count = 0
+        self.pattern = self.ctr.make_solid_pattern((0, 0, 0))
+
+    def getnext(self):
+        self.count += 1
+        self.pattern.buffer[:] = bytes([self.count % 256]) * len(self.pattern.buffer)
+        return self.pattern
+
+
+class Failing(Counter):
+    def getnext(self):
+        if self.count == 3:
+            raise ValueError("broken effect")
+        return super(Failing, self).getnext()
+
+
+def play(ctr, effect, seconds):
+    sent = []
+
+    def show_rt_frame(frame):
+        time.sleep(0.01)  # Let the next frame be rendered meanwhile
+        if ctr.is_pattern(frame):
+            frame = ctr.to_movie(frame)
+        frame.seek(0)
+        sent.append(frame.read())
+
+    ctr.show_rt_frame = show_rt_frame
+    effect.reset(False)
+    sched = RealtimeScheduler(ctr, effect, fps=50)
+    sched.start()
+    time.sleep(seconds)
+    sched.cancel()
+    return sent, sched
+
+
+def test_frames_updated_in_place_are_sent_in_order(make_ctr):
+    ctr = make_ctr(leds=20)
+    sent, sched = play(ctr, Counter(ctr), 0.5)
+    assert len(sent) > 5
+    assert [frame[0] for frame in sent] == list(range(1, len(sent) + 1))
+
+
+def test_glitter_sent_as_rendered(make_ctr):
+    ctr = make_ctr(leds=20)
+    random.seed(3)
+    effect = Gold(ctr)
+    effect.reset(False)
+    serial = [bytes(ctr.to_movie(effect.getnext()).read()) for i in range(40)]
+    random.seed(3)
+    sent, sched = play(ctr, Gold(ctr), 0.5)
+    assert len(sent) > 5
+    assert sent == serial[: len(sent)]
+
+
+def test_failing_effect_is_recorded(make_ctr):
+    ctr = make_ctr(leds=20)
+    sent, sched = play(ctr, Failing(ctr), 0.3)
+    assert [frame[0] for frame in sent] == [1, 2, 3]
+    assert sched.stats.errors == 1
+    assert isinstance(sched.stats.last_error, ValueError)
+    assert not sched.is_alive()
@@ -0,0 +1,55 @@
+import random
+
+from xled_plus.emulator import connect
+from xled_plus.render import render_parallel
+from xled_plus.shapes import Blob, MovingShapesScene, Scene, ShapeGrid
+
+
+class NoisyBlob(Blob):
+    """
+    Blob which flickers randomly, drawing a random number for each led.
+    """
+
+    def get_color(self, coord, ind):
+        col = super(NoisyBlob, self).get_color(coord, ind)
+        if col is False:
+            return False
+        return col if random.random() < 0.5 else (0, 0, 0)
+
+
+def make_scene(ctr, blobcls):
+    scene = Scene(ctr)
+    scene.seed = 42
+    scene.add_shape(blobcls((0.0, 0.0), 0.4, (255, 0, 0)))
+    scene.add_shape(Blob((0.3, 0.2), 0.3, (0, 0, 255)))
+    scene.shapes[0].speed = (0.01, 0.0)
+    return scene
+
+
+def test_parallel_movie_with_random_shape(make_ctr):
+    ctr = make_ctr(leds=200, dim=2)
+    for blobcls in (Blob, NoisyBlob):
+        serial = make_scene(ctr, blobcls).make_movie(40).getvalue()
+        parallel = render_parallel(make_scene(ctr, blobcls), 40, processes=4)
+        assert parallel.getvalue() == serial
+
+
+def test_irregular_layouts(make_emulator):
+    # Rounding may put the highest led coordinate just outside the shape grid
+    emu = make_emulator(leds=60, dim=3)
+    ctr = connect(emu.host)
+    rnd = random.Random(7)
+    for n in range(20):
+        emu.device.layout = [
+            {"x": rnd.uniform(-1, 1), "y": rnd.uniform(0, 1), "z": rnd.uniform(-1, 1)}
+            for i in range(60)
+        ]
+        ctr.fetch_layout()
+        scene = MovingShapesScene(ctr)
+        for i in range(5):
+            scene.getnext()
+    lo, hi = 0.515908805880605, 0.6888437030500962
+    coords = [(lo + (hi - lo) * i / 195.0,) * 2 for i in range(195)] + [(hi, hi)]
+    grid = ShapeGrid(coords)
+    assert grid.leds_in([((lo, lo), (lo, lo))])[0] == 0
+    assert grid.leds_in([((hi, hi), (hi, hi))])[-1] == 195
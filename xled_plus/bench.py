@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.bench
+~~~~~~~~~~~~~~~
+
+Throughput benchmark of the effects, run as:
+
+    python -m xled_plus.bench --leds 2000 --dim 2 --frames 100 -o run.json
+
+It starts an emulated device (see xled_plus.emulator) in a separate process
+with the given number of leds and a synthetic 1D, 2D or 3D layout, and runs
+every effect in xled_plus.effects, xled_plus.sequence and xled_plus.shapes,
+and the effects defined in the sample scripts (see SAMPLE_EFFECTS), for a
+fixed number of frames. In "rt" mode each frame is computed with getnext() and sent to the
+device with show_rt_frame, and in "movie" mode the frames are rendered into
+a movie with make_movie.
+
+For each effect and mode it reports frames per second, microseconds per led
+and frame, and, in a second run with tracemalloc, the peak memory use and
+the number of memory blocks left allocated after the run. The results are
+written as JSON, and with --compare a previous result file is read and any
+effect that has become slower than the tolerance is reported, with exit
+status 1.
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import gc
+import importlib
+import inspect
+import json
+import platform
+import random
+import re
+import signal
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from xled_plus import effects, sequence, shapes
+from xled_plus.effect_base import Effect
+from xled_plus.emulator import connect
+from xled_plus.ledcolor import hsl_color
+from xled_plus.pattern import random_hsl_color_func
+
+HSL_COLS = [(0.0, 1.0, 0.0), (0.33, 1.0, -0.2), (0.6, 1.0, 0.0), (0.83, 0.8, 0.3)]
+
+# Arguments, besides the controller, for the effects that need them
+EFFECT_ARGS = {
+    "GlowEffect": lambda ctr: ((list(HSL_COLS), 2, [2, 4]), {}),
+    "GlowCP": lambda ctr: ((list(HSL_COLS),), {}),
+    "SparkleEffect": lambda ctr: (
+        (4, effects.random_color_func(light=0.2), effects.flashlight_func(16, 16)),
+        {},
+    ),
+    "SparkleCP": lambda ctr: ((list(HSL_COLS),), {}),
+    "BreathEffect": lambda ctr: ((list(HSL_COLS), 1, 0.75, [12, 30]), {}),
+    "BreathCP": lambda ctr: ((list(HSL_COLS),), {}),
+    "GlitterEffect": lambda ctr: ((10, list(HSL_COLS[1:]), HSL_COLS[0]), {}),
+    "GlitterCP": lambda ctr: ((list(HSL_COLS),), {}),
+    "RotateEffect": lambda ctr: (
+        (
+            ctr.make_func_pattern(
+                lambda i: hsl_color(i / float(ctr.num_leds), 1.0, 0.0), circular=True
+            ),
+            False,
+        ),
+        {},
+    ),
+    "ColorMeanderEffect": lambda ctr: (("solid",), {}),
+    "Sequence": lambda ctr: ((lambda x: hsl_color(x, 1.0, 0.0), 0.2, 1.0), {}),
+    "ColorSequence": lambda ctr: ((rgb_cols(),), {}),
+    "GradientSequence": lambda ctr: ((rgb_cols(),), {}),
+    "RotatingAngleColorSequence": lambda ctr: ((rgb_cols(),), {"torque": 7.2}),
+    "RotatingAngleGradientSequence": lambda ctr: ((rgb_cols(),), {"torque": 7.2}),
+    "VaryingAngleColorSequence": lambda ctr: ((rgb_cols(),), {}),
+    "VaryingAngleGradientSequence": lambda ctr: ((rgb_cols(),), {}),
+    "RunningText": lambda ctr: (("XLED Plus", (255, 160, 0)), {}),
+    "CaleidoScene": lambda ctr: ((5,), {}),
+    "BouncingScene": lambda ctr: ((5,), {}),
+}
+
+# Classes that are only used as base classes, and can not run by themselves
+ABSTRACT_EFFECTS = ("RotatingAngleSequence", "VaryingAngleSequence")
+
+# Effect classes defined in the sample scripts, with the arguments besides
+# the controller that the scripts launch them with
+SAMPLE_EFFECTS = [
+    ("day16", "WheelEffect", lambda ctr: ((rgb_cols(), 1, 0.3), {})),
+    ("day19", "RotatingStarScene", lambda ctr: ((), {})),
+    ("day20", "SoftKaleidoScene", lambda ctr: ((5, random_hsl_color_func(light=0.0)), {})),
+    ("day21", "MoonScene", lambda ctr: ((), {})),
+    ("day22", "SnowingScene", lambda ctr: ((), {})),
+    ("day23", "Crystal", lambda ctr: ((), {})),
+    ("day24", "ChristmasBallsScene", lambda ctr: ((rgb_cols(),), {})),
+    ("day27", "MeanderingKaleidoScene", lambda ctr: ((6,), {})),
+    ("day28", "FlowerScene", lambda ctr: ((6,), {})),
+    ("day29", "MeanderBouncingScene", lambda ctr: ((5,), {"size": 0.4})),
+    ("day31a", "FireworksScene", lambda ctr: ((), {})),
+    ("day31b", "FireworksScene", lambda ctr: ((), {})),
+]
+
+
+def rgb_cols():
+    return [hsl_color(*col) for col in HSL_COLS]
+
+
+def builtin_effects():
+    """
+    Returns a list of (name, factory) for the effect classes in the effects,
+    sequence and shapes modules, where factory(ctr) creates the effect.
+
+    :rtype: list
+    """
+    res = []
+    for module in (effects, sequence, shapes):
+        for name, cls in sorted(vars(module).items()):
+            if (
+                inspect.isclass(cls)
+                and issubclass(cls, Effect)
+                and cls.__module__ == module.__name__
+                and name not in ABSTRACT_EFFECTS
+            ):
+                res.append((module.__name__ + "." + name, class_factory(cls)))
+    return res
+
+
+def class_factory(cls):
+    def factory(ctr):
+        args, kwargs = EFFECT_ARGS.get(cls.__name__, lambda ctr: ((), {}))(ctr)
+        return cls(ctr, *args, **kwargs)
+
+    return factory
+
+
+def sample_effects():
+    """
+    Returns a list of (name, factory) for the effect classes in
+    SAMPLE_EFFECTS, where factory(ctr) creates the effect. The sample is
+    imported when the effect is created, so a broken sample only fails its
+    own runs.
+
+    :rtype: list
+    """
+    return [
+        ("samples.{}.{}".format(name, clsname), sample_factory(name, clsname, args))
+        for name, clsname, args in SAMPLE_EFFECTS
+    ]
+
+
+def sample_factory(name, clsname, args):
+    def factory(ctr):
+        module = importlib.import_module("xled_plus.samples." + name)
+        ctr.adjust_layout_aspect(1.0)  # As in the sample scripts
+        posargs, kwargs = args(ctr)
+        return getattr(module, clsname)(ctr, *posargs, **kwargs)
+
+    return factory
+
+
+def all_effects(ctr):
+    """
+    Returns a list of (name, factory) for all built-in and sample effects.
+
+    :rtype: list
+    """
+    return builtin_effects() + sample_effects()
+
+
+class BenchTimeout(Exception):
+    pass
+
+
+def timeout_handler(signum, frame):
+    raise BenchTimeout("Did not finish in time")
+
+
+def run_frames(ctr, effect, mode, numframes, timeout=None):
+    if timeout and hasattr(signal, "setitimer"):
+        # Some effects never finish in some modes, e.g by waiting for time
+        # to pass in reset, so they are interrupted
+        old = signal.signal(signal.SIGALRM, timeout_handler)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            run_frames(ctr, effect, mode, numframes)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old)
+    elif mode == "rt":
+        effect.reset(False)
+        for i in range(numframes):
+            ctr.show_rt_frame(effect.getnext())
+    else:
+        effect.make_movie(numframes)
+
+
+def bench_effect(ctr, factory, mode, numframes, memory=True, timeout=None):
+    """
+    Runs an effect for numframes frames in the given mode, "rt" or "movie".
+    Returns a dict with the time, frames per second, microseconds per led
+    and frame, and if memory is True the peak memory use and the number of
+    memory blocks still allocated after the run. A run that takes more than
+    timeout seconds is interrupted with BenchTimeout.
+
+    :rtype: dict
+    """
+    random.seed(1)
+    ctr.layout = ctr.layout_bounds = False  # Undo aspect changes of samples
+    effect = factory(ctr)
+    if mode == "rt":
+        ctr.set_mode("rt")  # Not part of the frames
+    gc.collect()
+    start = time.perf_counter()
+    run_frames(ctr, effect, mode, numframes, timeout)
+    elapsed = time.perf_counter() - start
+    res = {
+        "seconds": elapsed,
+        "fps": numframes / elapsed if elapsed else 0.0,
+        "us_per_led": 1e6 * elapsed / (numframes * ctr.num_leds),
+    }
+    if memory:
+        random.seed(1)
+        effect = factory(ctr)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            run_frames(ctr, effect, mode, numframes, timeout)
+            peak = tracemalloc.get_traced_memory()[1]
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        res["peak_memory"] = peak - base
+        res["retained_blocks"] = sum(
+            max(0, stat.count_diff) for stat in after.compare_to(before, "lineno")
+        )
+    return res
+
+
+def start_device(leds, dim, profile):
+    """
+    Starts an emulated device in a separate process, so that it does not
+    compete with the benchmark for the interpreter. Returns the process and
+    the host to connect to.
+
+    :rtype: tuple
+    """
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-u",  # The host is read from its output before it exits
+            "-m",
+            "xled_plus.emulator",
+            "--leds",
+            str(leds),
+            "--dim",
+            str(dim),
+            "--profile",
+            profile,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+    host = proc.stdout.readline().strip()
+    if not host:
+        proc.wait()
+        raise RuntimeError("The emulated device could not be started")
+    return proc, host
+
+
+def run(args):
+    proc, host = start_device(args.leds, args.dim, args.profile)
+    try:
+        ctr = connect(host)
+        results = []
+        pattern = re.compile(args.effects) if args.effects else None
+        for name, factory in all_effects(ctr):
+            if pattern and not pattern.search(name):
+                continue
+            for mode in args.modes.split(","):
+                entry = {"effect": name, "mode": mode}
+                try:
+                    entry.update(
+                        bench_effect(
+                            ctr,
+                            factory,
+                            mode,
+                            args.frames,
+                            not args.no_memory,
+                            args.timeout,
+                        )
+                    )
+                except Exception as err:
+                    entry["error"] = "{}: {}".format(type(err).__name__, err)
+                results.append(entry)
+                report(entry)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "config": {
+            "leds": args.leds,
+            "dim": args.dim,
+            "profile": args.profile,
+            "frames": args.frames,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def report(entry):
+    if "error" in entry:
+        line = "{effect:50} {mode:5} {error}".format(**entry)
+    else:
+        line = "{effect:50} {mode:5} {fps:9.1f} fps {us_per_led:8.2f} us/led".format(
+            **entry
+        )
+        if "peak_memory" in entry:
+            line += " {:9.0f} kB peak {:7d} blocks".format(
+                entry["peak_memory"] / 1024.0, entry["retained_blocks"]
+            )
+    sys.stderr.write(line + "\n")
+
+
+def compare(old, new, tolerance):
+    """
+    Returns a list of (effect, mode, old fps, new fps) for the effects that
+    have become slower than the tolerance, as a fraction of the old fps.
+
+    :rtype: list
+    """
+    oldfps = dict(
+        ((e["effect"], e["mode"]), e["fps"]) for e in old["results"] if "fps" in e
+    )
+    res = []
+    for entry in new["results"]:
+        key = (entry["effect"], entry["mode"])
+        if "fps" in entry and key in oldfps:
+            if entry["fps"] < oldfps[key] * (1.0 - tolerance):
+                res.append((key[0], key[1], oldfps[key], entry["fps"]))
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the xled_plus effects")
+    parser.add_argument("--leds", type=int, default=500, help="number of leds")
+    parser.add_argument("--dim", type=int, default=2, help="layout dimension")
+    parser.add_argument("--profile", default="RGB", help="RGB or RGBW")
+    parser.add_argument("--frames", type=int, default=50, help="frames per run")
+    parser.add_argument("--modes", default="rt,movie", help="rt, movie or both")
+    parser.add_argument("--effects", help="regular expression selecting effects")
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="max seconds per run"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the memory measurement"
+    )
+    parser.add_argument("-o", "--output", help="file to write the JSON results to")
+    parser.add_argument("--compare", help="earlier JSON results to compare with")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed slowdown fraction"
+    )
+    args = parser.parse_args()
+    res = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(res, f, indent=1)
+    else:
+        json.dump(res, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        slower = compare(old, res, args.tolerance)
+        for effect, mode, fps0, fps1 in slower:
+            sys.stderr.write(
+                "Slower: {} {} {:.1f} -> {:.1f} fps\n".format(effect, mode, fps0, fps1)
+            )
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,21 @@ Base class Effect to provide a consistent interface to moving effects.
 As outer API, i.e to users of an effect, it provides these functions:
 'launch_movie()' to create a movie of the effect and upload and start playing it.
 'save_movie()' to create a movie of the effect and save it to file for later use.
+  Both render the movie in the background while it is uploaded or written
+  (see xled_plus.render), and 'make_movie(numframes)' returns a rendered movie.
+  With the argument 'processes' the movie is instead rendered in parallel.
 'launch_rt()' for playing the effect in real time.
+  With 'launch_rt(asynchronous=True)' frames are instead scheduled from an
+  asyncio event loop (see xled_plus.rtscheduler), which computes the next frame
+  while sending the current one and drops frames rather than drifting.
 'stop_rt()' for stopping the currently played real time effect.
+'enable_metrics()' for recording the timing of each real time frame.
+
+Real time effects are played in sessions, one per controller, kept by a
+RealtimeSessionManager (by default the module level 'rt_sessions'). Launching
+an effect only replaces the effect playing on the same controller, so several
+effects can stream at the same time to different devices. The function
+'stop_rt()' at module level stops all of them.
 
 As inner API, i.e for communicating with its subclasses, it requires each subclass
 to provide two functions:
@@ -23,11 +36,25 @@ required for the movie (then typically the same as 'preferred_frames') or False
 if a real time effect is requested. If there is a non-False numframes, 'reset'
 should try to set up data structures to make sure that after this many frames
 the movie will seamlessly return to the first frame.
+
+For rendering in parallel, the effect can be checkpointed and restored with
+'checkpoint()' and 'restore()', and advanced without rendering with
+'fast_forward(numframes)'. Subclasses can override 'fast_forward' with a cheaper
+version than calling 'getnext', as long as it leaves the effect and the random
+generator in exactly the same state. If 'seed' is set on the effect, the random
+generator is seeded with it before each movie is rendered, which makes the
+movie reproducible. If 'movie_cache' is set to a MovieCache (see
+xled_plus.moviecache), 'launch_movie()' and 'save_movie()' reuse a movie of
+the same effect rendered earlier.
 """
 
+import copy
+import random
 import sys
 import time
 
+from xled_plus.render import RenderStream, render_parallel
+
 if sys.version_info.major == 2:
     from threading import _Timer
 
@@ -49,10 +76,134 @@ class RepeatedTimer(TimerX):
             self.function(*self.args, **self.kwargs)
 
 
-effect_timer = None
+class RealtimeSession(object):
+    """
+    One effect playing in real time on one controller.
+    """
+
+    def __init__(self, ctr, effect, asynchronous=False):
+        self.ctr = ctr
+        self.effect = effect
+        self.asynchronous = asynchronous
+        self.timer = None
+        self.started = None
+
+    def start(self):
+        def doit():
+            metrics = self.ctr.metrics
+            if metrics is None:
+                self.ctr.show_rt_frame(self.effect.getnext())
+            else:
+                metrics.begin_frame()
+                start = time.perf_counter()
+                frame = self.effect.getnext()
+                render = time.perf_counter() - start
+                self.ctr.show_rt_frame(frame)
+                metrics.end_frame(render=render)
+
+        if self.asynchronous:
+            from xled_plus.rtscheduler import RealtimeScheduler
+
+            self.timer = RealtimeScheduler(self.ctr, self.effect)
+        else:
+            self.timer = RepeatedTimer(1.0 / self.effect.preferred_fps, doit)
+        self.effect.reset(False)
+        self.started = time.time()
+        self.timer.start()
+
+    def stop(self, restore_mode=True):
+        if self.timer:
+            self.timer.cancel()
+        self.timer = None
+        if restore_mode and self.ctr.last_mode:
+            self.ctr.set_mode(self.ctr.last_mode)
+
+    def is_running(self):
+        return self.timer is not None and self.timer.is_alive()
+
+    def status(self):
+        """
+        Returns a dict describing the session. For asynchronous sessions it
+        also contains the frame statistics of the scheduler.
+
+        :rtype: dict
+        """
+        res = {
+            "host": self.ctr.host,
+            "effect": type(self.effect).__name__,
+            "fps": self.effect.preferred_fps,
+            "running": self.is_running(),
+            "uptime": time.time() - self.started if self.started else 0.0,
+        }
+        if self.asynchronous and self.timer:
+            res["stats"] = self.timer.stats.summary()
+        if self.ctr.metrics is not None:
+            res["metrics"] = self.ctr.metrics.summary()
+        return res
+
+
+class RealtimeSessionManager(object):
+    """
+    Keeps track of the real time sessions, at most one per controller.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+
+    def launch(self, effect, asynchronous=False):
+        """
+        Starts playing the effect on its controller, replacing any effect
+        already playing there.
+
+        :rtype: RealtimeSession
+        """
+        self.stop(effect.ctr, restore_mode=False)
+        session = RealtimeSession(effect.ctr, effect, asynchronous)
+        self.sessions[effect.ctr.host] = session
+        session.start()
+        return session
+
+    def get(self, ctr):
+        return self.sessions.get(ctr.host)
+
+    def stop(self, ctr, restore_mode=True):
+        session = self.sessions.pop(ctr.host, None)
+        if session:
+            session.stop(restore_mode)
+        elif restore_mode and ctr.last_mode:
+            ctr.set_mode(ctr.last_mode)
+
+    def stop_all(self, restore_mode=False):
+        for host in list(self.sessions):
+            self.sessions.pop(host).stop(restore_mode)
+
+    def status(self):
+        """
+        Returns a dict from controller host to the status of its session.
+
+        :rtype: dict
+        """
+        return {host: sess.status() for host, sess in self.sessions.items()}
+
+
+rt_sessions = RealtimeSessionManager()
 
 
 class Effect(object):
+    # Attributes shared with checkpoints instead of copied
+    shared_state = ("ctr",)
+    # Set to an int to seed the random generator before rendering movies
+    seed = None
+    # Set to a MovieCache to reuse movies rendered earlier
+    movie_cache = None
+    # Attributes, besides the constructor arguments, that the movie depends on
+    cache_attrs = ("preferred_fps",)
+
+    def __new__(cls, *args, **kwargs):
+        self = super(Effect, cls).__new__(cls)
+        self.init_args = (args, kwargs)  # Identifies the effect in movie_cache
+        return self
+
     def __init__(self, ctr):
         self.ctr = ctr
         self.preferred_frames = 120
@@ -64,46 +215,137 @@ class Effect(object):
     def getnext(self):
         pass  # provided by subclass
 
-    def launch_rt(self):
-        global effect_timer
+    def launch_rt(self, asynchronous=False, manager=None):
+        (manager or rt_sessions).launch(self, asynchronous)
+        return True
+
+    def stop_rt(self, manager=None):
+        (manager or rt_sessions).stop(self.ctr)
 
-        def doit():
-            self.ctr.show_rt_frame(self.getnext())
+    def enable_metrics(self, callback=None, history=500):
+        """
+        Starts recording the timing of each real time frame shown on the
+        controller of the effect (see xled_plus.metrics).
 
-        if effect_timer:
-            effect_timer.cancel()
-        effect_timer = RepeatedTimer(1.0 / self.preferred_fps, doit)
-        self.reset(False)
-        effect_timer.start()
-        return True
+        :param callback: function called with a dict of timings for each frame
+        :param int history: number of frames kept in the timing histograms
+        :rtype: FrameMetrics
+        """
+        from xled_plus.metrics import FrameMetrics
 
-    def stop_rt(self):
-        global effect_timer
-        if effect_timer:
-            effect_timer.cancel()
-        effect_timer = None
-        if self.ctr.last_mode:
-            self.ctr.set_mode(self.ctr.last_mode)
+        self.ctr.metrics = FrameMetrics(self.preferred_fps, history, callback)
+        return self.ctr.metrics
+
+    def disable_metrics(self):
+        self.ctr.metrics = None
 
-    def make_movie(self, numframes):
-        frames = []
-        self.reset(numframes)
+    def fast_forward(self, numframes):
+        """
+        Advances the effect numframes frames without returning them, leaving
+        it and the random generator in the same state as that many calls to
+        getnext would. Subclasses can provide a cheaper way than rendering.
+        """
         for i in range(numframes):
-            frames.append(self.getnext())
-        return self.ctr.to_movie(frames)
+            self.getnext()
 
-    def launch_movie(self):
-        self.stop_rt()
-        self.ctr.show_movie(self.make_movie(self.preferred_frames), self.preferred_fps)
+    def checkpoint(self):
+        """
+        Returns a copy of the current state of the effect and the random
+        generator, which can be given to restore.
+        """
+        memo = self.shared_memo()
+        state = dict(
+            (k, v) for k, v in self.__dict__.items() if k not in self.shared_state
+        )
+        return (copy.deepcopy(state, memo), random.getstate())
+
+    def shared_memo(self):
+        memo = dict(
+            (id(self.__dict__[k]), self.__dict__[k])
+            for k in self.shared_state
+            if k in self.__dict__
+        )
+        memo[id(self)] = self
+        return memo
+
+    def restore(self, checkpoint):
+        """
+        Returns the effect and the random generator to a state from checkpoint.
+        """
+        state, randstate = checkpoint
+        self.__dict__.update(copy.deepcopy(state, self.shared_memo()))
+        random.setstate(randstate)
+
+    def after_fork(self):
+        pass  # provided by subclasses that need to reopen resources in a new process
+
+    def make_movie(self, numframes, processes=None):
+        """
+        Returns a rendered movie of the effect. With processes larger than one
+        the frames are rendered in that many processes, giving the same movie.
+        """
+        if processes and processes > 1:
+            return render_parallel(self, numframes, processes)
+        movie = RenderStream(self, numframes)
+        movie.getbuffer()
+        return movie
 
-    def save_movie(self, name):
-        self.ctr.save_movie(
-            name, self.make_movie(self.preferred_frames), self.preferred_fps
+    def cached_movie(self, numframes, processes=None):
+        """
+        Returns the movie of the effect from movie_cache if it is there,
+        otherwise renders it and stores it in the cache. In both cases the
+        effect is left in the state it had before, so that the same movie is
+        found the next time.
+        """
+        cache = self.movie_cache
+        key = cache.key(self, numframes)
+        if key is None:
+            return self.make_movie(numframes, processes)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit.movie(close=True)
+        state = self.checkpoint()
+        movie = self.make_movie(numframes, processes)
+        self.restore(state)
+        cache.put(
+            key,
+            movie,
+            self.ctr.num_leds,
+            self.ctr.led_bytes,
+            self.preferred_fps,
+            self.ctr.layout_hash(),
         )
+        movie.seek(0)
+        return movie
+
+    def stream_movie(self, numframes):
+        """
+        Returns a movie of the effect which is rendered in the background
+        while it is being read, e.g during the upload to the device.
+
+        :rtype: RenderStream
+        """
+        return RenderStream(self, numframes, background=True)
+
+    def launch_movie(self, processes=None):
+        self.stop_rt()
+        if self.movie_cache:
+            movie = self.cached_movie(self.preferred_frames, processes)
+        elif processes:
+            movie = self.make_movie(self.preferred_frames, processes)
+        else:
+            movie = self.stream_movie(self.preferred_frames)
+        self.ctr.show_movie(movie, self.preferred_fps)
+
+    def save_movie(self, name, binary=False, processes=None):
+        if self.movie_cache:
+            movie = self.cached_movie(self.preferred_frames, processes)
+        elif processes:
+            movie = self.make_movie(self.preferred_frames, processes)
+        else:
+            movie = self.stream_movie(self.preferred_frames)
+        self.ctr.save_movie(name, movie, self.preferred_fps, binary)
 
 
 def stop_rt():
-    global effect_timer
-    if effect_timer:
-        effect_timer.cancel()
-        effect_timer = None
+    rt_sessions.stop_all()
@@ -19,9 +19,10 @@ from xled_plus.pattern import (
     randompoisson,
     randomdiscrete,
     random_hsl_color_func,
-    sprinkle_pattern,
 )
 from xled_plus.ledcolor import hsl_color
+from xled_plus.frame import Frame
+from itertools import chain
 import random
 
 
@@ -54,7 +55,7 @@ class Glowbit:
             self.lastcol = self.initcol1
             self.nextcol = self.initcol2
 
-    def getnext(self):
+    def step(self):
         if self.currind == self.steps:
             self.lastcol = self.nextcol
             if self.loop and self.count + self.steps >= self.loop:
@@ -68,6 +69,9 @@ class Glowbit:
             self.currind = 0
         self.currind += 1
         self.count += 1
+
+    def getnext(self):
+        self.step()
         return blendcolors(self.lastcol, self.nextcol, float(self.currind) / self.steps)
 
 
@@ -94,19 +98,79 @@ class GlowEffect(Effect):
             steps = list(range(self.cycles[0], self.cycles[-1] + 1))
         pr1 = 13 if len(steps) % 13 != 0 else 7
         pr2 = 11 if len(steps) % 11 != 0 else 7
-        self.glowarray = [
-            Glowbit(
-                self.cols,
-                self.bend,
-                steps[(i * pr1) % len(steps)],
-                (i * pr2) % steps[(i * pr1) % len(steps)],
-                numframes,
-            )
-            for i in range(self.ctr.num_leds)
+        # The state of all leds is kept in flat lists, and stepped exactly
+        # like a Glowbit per led, drawing the same random numbers
+        num = self.ctr.num_leds
+        self.loop = numframes
+        self.count = 0
+        self.rgbcols = [hsl_color(*col) for col in self.cols]
+        self.steps = [steps[(i * pr1) % len(steps)] for i in range(num)]
+        self.lastcol = [(0, 0, 0)] * num
+        self.nextcol = [(0, 0, 0)] * num
+        if self.loop:
+            self.initcol1 = []
+            self.initcol2 = []
+            for i in range(num):
+                self.initcol1.append(self.random_color())
+                self.initcol2.append(self.random_color())
+            self.lastcol = list(self.initcol1)
+            self.nextcol = list(self.initcol2)
+        # Components of lastcol, and of nextcol minus lastcol, three per led
+        self.lastrgb = [c for col in self.lastcol for c in col]
+        self.diffrgb = [
+            c2 - c1 for col1, col2 in zip(self.lastcol, self.nextcol) for (c1, c2) in zip(col1, col2)
         ]
+        # The leds change colors at the frame counts in 'wraps', and the step
+        # of a led within its color change is count - start + 1
+        self.start = [0] * num
+        self.wraps = {}
+        for i in range(num):
+            initstep = (i * pr2) % self.steps[i]
+            first = self.steps[i] - initstep if initstep else 0
+            self.start[i] = first - self.steps[i]
+            self.wraps.setdefault(first, []).append(i)
+
+    def random_color(self):
+        return self.rgbcols[int((random.random() ** self.bend) * len(self.cols))]
+
+    def step(self):
+        count = self.count
+        for i in sorted(self.wraps.pop(count, [])):
+            steps = self.steps[i]
+            self.lastcol[i] = self.nextcol[i]
+            if self.loop and count + steps >= self.loop:
+                self.nextcol[i] = self.initcol2[i]
+            elif self.loop and count + 2 * steps >= self.loop:
+                self.nextcol[i] = self.initcol1[i]
+            else:
+                self.nextcol[i] = self.random_color()
+            self.lastrgb[3 * i:3 * i + 3] = self.lastcol[i]
+            self.diffrgb[3 * i:3 * i + 3] = [
+                c2 - c1 for (c1, c2) in zip(self.lastcol[i], self.nextcol[i])
+            ]
+            self.start[i] = count
+            self.wraps.setdefault(count + steps, []).append(i)
+        self.count += 1
 
     def getnext(self):
-        return self.ctr.make_func_pattern(lambda i: self.glowarray[i].getnext())
+        self.step()
+        count = self.count
+        props = [float(count - start) / steps for start, steps in zip(self.start, self.steps)]
+        return self.ctr.make_rgb_pattern(
+            [
+                int(round(c1 + d * prop))
+                for c1, d, prop in zip(
+                    self.lastrgb, self.diffrgb, chain.from_iterable(zip(props, props, props))
+                )
+            ]
+        )
+
+    def fast_forward(self, numframes):
+        if type(self).getnext != GlowEffect.getnext:
+            return super(GlowEffect, self).fast_forward(numframes)
+        # Step the leds in the same order as getnext, without blending colors
+        for i in range(numframes):
+            self.step()
 
 
 class Charcoal(GlowEffect):
@@ -226,6 +290,87 @@ varied color temperature of whites, unlike the origonal.
 """
 
 
+class FreeLeds(object):
+    """
+    The leds of a SparkleEffect that are free to start sparkling, in the order
+    they became free. Membership is checked in constant time, and removal or
+    lookup by position takes logarithmic time, using a Fenwick tree of counts
+    over slots handed out in that order. The slots are compacted when used up.
+
+    :param int num: number of leds, all initially free in index order
+    """
+
+    def __init__(self, num):
+        self.slots = [-1] * num
+        self.rebuild(list(range(num)))
+
+    def rebuild(self, inds):
+        size = 16
+        while size < 2 * len(inds):
+            size *= 2
+        self.size = size
+        self.order = inds + [None] * (size - len(inds))
+        self.tree = [0] * (size + 1)
+        for slot, ind in enumerate(inds):
+            self.slots[ind] = slot
+            self.tree[slot + 1] = 1
+        for i in range(1, size + 1):
+            j = i + (i & -i)
+            if j <= size:
+                self.tree[j] += self.tree[i]
+        self.next = len(inds)
+        self.count = len(inds)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, ind):
+        return self.slots[ind] >= 0
+
+    def __iter__(self):
+        return (ind for ind in self.order[: self.next] if ind is not None)
+
+    def update(self, slot, delta):
+        i = slot + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def append(self, ind):
+        if self.next == self.size:
+            self.rebuild(list(self))
+        slot = self.next
+        self.next += 1
+        self.order[slot] = ind
+        self.slots[ind] = slot
+        self.update(slot, 1)
+        self.count += 1
+
+    def remove(self, ind):
+        slot = self.slots[ind]
+        self.slots[ind] = -1
+        self.order[slot] = None
+        self.update(slot, -1)
+        self.count -= 1
+
+    def pop(self, pos):
+        """
+        Removes and returns the led at position pos among the free leds.
+        """
+        slot = 0
+        rest = pos + 1
+        bit = self.size
+        while bit:
+            i = slot + bit
+            if i <= self.size and self.tree[i] < rest:
+                slot = i
+                rest -= self.tree[i]
+            bit >>= 1
+        ind = self.order[slot]
+        self.remove(ind)
+        return ind
+
+
 class SparkleEffect(Effect):
     def __init__(self, ctr, freq, nfunc, sfunc, icol=(0, 0, 0)):
         super(SparkleEffect, self).__init__(ctr)
@@ -238,7 +383,7 @@ class SparkleEffect(Effect):
         self.pattern = self.ctr.make_solid_pattern(self.initialcol)
         self.time = -1
         self.slist = []
-        self.olist = list(range(0, self.ctr.num_leds))
+        self.free = FreeLeds(self.ctr.num_leds)
         self.numframes = False  # intentionally set to False here
         if numframes:
             # walk a number of steps, count the sfunc cycle, and record the poisson outcomes
@@ -247,47 +392,58 @@ class SparkleEffect(Effect):
             while self.stepfunc(0, self.time + 1, tmp) not in [False, True]:
                 self.getnext()
             self.leadintime = self.time
-            self.leadin = [ele for ele in self.slist]
+            # lead-in sparkles by start time, to be repeated when wrapping around
+            self.leadin = {}
+            for (ind, coldesc, tm) in self.slist:
+                self.leadin.setdefault(tm, []).append((ind, coldesc))
+            # leds kept free for the lead-in sparkles, and those of them
+            # that became free again since the last frame
+            self.reserved = set()
+            self.reservedtime = -1
+            self.returned = []
             self.numframes = numframes
 
+    def reserve_leadin(self):
+        limit = self.time - self.numframes + self.leadintime
+        for tm in range(self.reservedtime + 1, limit + 1):
+            for (ind, coldesc) in self.leadin.get(tm, ()):
+                self.reserved.add(ind)
+                if ind in self.free:
+                    self.free.remove(ind)
+        self.reservedtime = max(self.reservedtime, limit)
+        for ind in self.returned:
+            if ind in self.free:
+                self.free.remove(ind)
+        self.returned = []
+
     def getnext(self):
         self.time += 1
-        if self.numframes:
-            self.pattern = self.ctr.copy_pattern(self.pattern)  # only needed for movie
         if self.numframes and self.time >= self.numframes:
-            for (ind, coldesc, tm) in self.leadin:
-                if tm == self.time - self.numframes:
-                    self.slist.append((ind, coldesc, self.time))
+            for (ind, coldesc) in self.leadin.pop(self.time - self.numframes, ()):
+                self.slist.append((ind, coldesc, self.time))
         else:
             if self.numframes and self.time >= self.numframes - self.leadintime:
-                for (ind, coldesc, tm) in self.leadin:
-                    if (
-                        tm <= self.time - self.numframes + self.leadintime
-                        and ind in self.olist
-                    ):
-                        self.olist.remove(ind)
+                self.reserve_leadin()
             n = randompoisson(self.freq)
             for j in range(n):
-                if self.olist:
-                    pos = random.randint(0, len(self.olist) - 1)
-                    ind = self.olist[pos]
+                if self.free:
+                    ind = self.free.pop(random.randint(0, len(self.free) - 1))
                     coldesc = self.newfunc(ind, self.time)
                     self.slist.append((ind, coldesc, self.time))
-                    del self.olist[pos]
-        remlst = []
-        for pos, (ind, coldesc, stime) in enumerate(self.slist):
+        active = []
+        for ele in self.slist:
+            (ind, coldesc, stime) = ele
             col = self.stepfunc(ind, self.time - stime, coldesc)
-            if col is False:
-                remlst.append(pos)
-                self.olist.append(ind)
-            elif col is True:
-                remlst.append(pos)
-                self.olist.append(ind)
-                self.ctr.modify_pattern(self.pattern, ind, self.initialcol)
+            if col is False or col is True:
+                self.free.append(ind)
+                if self.numframes and ind in self.reserved:
+                    self.returned.append(ind)
+                if col is True:
+                    self.ctr.modify_pattern(self.pattern, ind, self.initialcol)
             else:
+                active.append(ele)
                 self.ctr.modify_pattern(self.pattern, ind, col)
-        for pos in reversed(sorted(remlst)):
-            del self.slist[pos]
+        self.slist = active
         return self.pattern
 
 
@@ -516,6 +672,10 @@ class Breathbit:
         prop = abs(self.currind - self.hsteps) / self.hsteps
         return dimcolor(self.col, (prop * self.lspan + 1.0 - self.lspan) ** 2)
 
+    def skip(self, numsteps):
+        if numsteps > 0:
+            self.currind = (min(self.currind, self.steps - 1) + numsteps) % self.steps
+
 
 class BreathEffect(Effect):
     def __init__(self, ctr, cols, bend, lspan, cycles, fps=False):
@@ -545,18 +705,43 @@ class BreathEffect(Effect):
             self.cols[int((random.random() ** self.bend) * len(self.cols))]
             for i in range(self.ctr.num_leds)
         ]
-        self.brarray = [
-            Breathbit(
-                colarray[i],
-                self.lspan,
-                steps[(i * pr1) % len(steps)],
-                initstep=(i * pr2) % steps[(i * pr1) % len(steps)],
-            )
-            for i in range(self.ctr.num_leds)
-        ]
+        # Each led repeats a cycle of colors, computed once for each
+        # combination of color and cycle length, as Breathbit would
+        lspan = 1.0 - (1.0 - self.lspan) ** 0.5
+        cycles = {}
+        self.steps = []
+        self.currind = []
+        self.colcycles = []
+        for i in range(self.ctr.num_leds):
+            n = steps[(i * pr1) % len(steps)]
+            initstep = (i * pr2) % n
+            key = (tuple(colarray[i]), n)
+            if key not in cycles:
+                col = hsl_color(*colarray[i])
+                hsteps = (n - 1) / 2.0
+                cycles[key] = [
+                    bytes(bytearray(dimcolor(col, (abs(ind - hsteps) / hsteps * lspan + 1.0 - lspan) ** 2)))
+                    for ind in range(n)
+                ]
+            self.steps.append(n)
+            self.currind.append(initstep if initstep else n)
+            self.colcycles.append(cycles[key])
 
     def getnext(self):
-        return self.ctr.make_func_pattern(lambda i: self.brarray[i].getnext())
+        self.currind = [
+            ind + 1 if ind + 1 < n else 0 for ind, n in zip(self.currind, self.steps)
+        ]
+        return self.ctr.make_rgb_pattern(
+            b"".join([cycle[ind] for cycle, ind in zip(self.colcycles, self.currind)])
+        )
+
+    def fast_forward(self, numframes):
+        if type(self).getnext != BreathEffect.getnext:
+            return super(BreathEffect, self).fast_forward(numframes)
+        if numframes > 0:
+            self.currind = [
+                (min(ind, n - 1) + numframes) % n for ind, n in zip(self.currind, self.steps)
+            ]
 
 
 class BreathCP(BreathEffect):
@@ -585,9 +770,35 @@ class GlitterEffect(Effect):
 
     def reset(self, numframes):
         self.pattern = self.ctr.make_solid_pattern(self.initialcol)
+        self.frame = self.ctr.copy_pattern(self.pattern)
+        self.sprinkled = []
+
+    def unsprinkle(self):
+        lb = self.frame.led_bytes
+        buf = self.frame.buffer
+        base = self.pattern.buffer
+        for ind in self.sprinkled:
+            buf[ind * lb : ind * lb + lb] = base[ind * lb : ind * lb + lb]
+        self.sprinkled = []
 
     def getnext(self):
-        return sprinkle_pattern(self.ctr, self.pattern, self.cols, self.freq)
+        # Same as sprinkle_pattern, but reusing the frame of the last step
+        self.unsprinkle()
+        n = randompoisson(self.freq)
+        self.sprinkled = random.sample(range(self.ctr.num_leds), n)
+        for ind in self.sprinkled:
+            self.ctr.modify_pattern(self.frame, ind, random.choice(self.cols))
+        return self.frame
+
+    def fast_forward(self, numframes):
+        if type(self).getnext != GlitterEffect.getnext:
+            return super(GlitterEffect, self).fast_forward(numframes)
+        # Draw the same random numbers as getnext
+        self.unsprinkle()
+        for i in range(numframes):
+            n = randompoisson(self.freq)
+            for ind in random.sample(range(self.ctr.num_leds), n):
+                random.choice(self.cols)
 
 
 class Silver(GlitterEffect):
@@ -645,16 +856,51 @@ class RotateEffect(Effect):
         self.preferred_fps = speed
 
     def reset(self, numframes):
-        self.pattern = self.ctr.copy_pattern(self.origpattern)
+        # Every frame is the original pattern rotated a multiple of step in
+        # the circular led order, so keep that order twice to take each
+        # rotation as a slice
+        pattern = self.ctr.copy_pattern(self.origpattern)
+        circbuf = self.ctr.circular_buffer(pattern.buffer)
+        self.circbuf = circbuf + circbuf
+        self.permkey = ("rotate", tuple(self.perm)) if self.perm else None
+        self.frameno = 0
+
+    def get_frame(self, k):
+        """
+        Returns frame k of the effect, independently of which frames were
+        generated before. Requires reset to have been called.
+
+        :param int k: frame number, counted from the start of the effect
+        :rtype: Frame
+        """
+        num = self.ctr.num_leds
+        lb = self.ctr.led_bytes
+        start = (num - (k * self.step) % num) * lb
+        buf = self.circbuf[start : start + num * lb]
+        if self.permkey:
+            gather = self.ctr.pixel_gather(self.permkey, self.perm_index)
+            buf = bytearray(gather(buf + bytes(lb)))
+        else:
+            buf = self.ctr.circular_buffer(buf)
+        return Frame(num, lb, buf)
+
+    def perm_index(self):
+        # Led i of the permuted pattern is led perm[i] of the rotated one,
+        # both in circular order. Leds not reached by perm stay black.
+        index = [self.ctr.num_leds] * self.ctr.num_leds
+        for i, k in enumerate(self.perm):
+            index[self.ctr.circind(i)] = k
+        return index
 
     def getnext(self):
-        currpattern = (
-            self.ctr.permute_pattern(self.pattern, self.perm, circular=True)
-            if self.perm
-            else self.pattern
-        )
-        self.pattern = self.ctr.rotate_pattern(self.pattern, self.step, circular=True)
-        return currpattern
+        frame = self.get_frame(self.frameno)
+        self.frameno += 1
+        return frame
+
+    def fast_forward(self, numframes):
+        if type(self).getnext != RotateEffect.getnext:
+            return super(RotateEffect, self).fast_forward(numframes)
+        self.frameno += numframes
 
 
 class Spectrum(RotateEffect):
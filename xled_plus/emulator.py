@@ -0,0 +1,939 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.emulator
+~~~~~~~~~~~~~~~~~~
+
+Emulated Twinkly devices, for running and measuring xled_plus without any
+physical lights.
+
+An Emulator serves the REST endpoints that xled and xled_plus use (login,
+device info, firmware version, led config, layout, mode, movies, playlist,
+led movie config, real time frames) over HTTP, and receives real time frames
+over UDP in protocol versions 1, 2 and 3. The number of leds, led profile,
+firmware version and sync group role are configurable, as well as latency
+of the HTTP responses and loss of HTTP responses and real time datagrams.
+Each device counts the requests, uploaded bytes and real time frames it
+receives, see EmulatedDevice.stats.
+
+Each emulator listens on its own loopback address, 127.0.0.2, 127.0.0.3
+and so on (which all lead to the local machine on Linux), with the UDP
+port for real time frames at 7777 as on a real device. Since the HTTP port
+is normally not 80, connect to emulators with the function connect, which
+also gives the interfaces UDP clients that do not occupy the local port
+7777. For example:
+
+    emus = start_group(3, leds=250)
+    ctr = connect([emu.host for emu in emus], parallel=True)
+    ...
+    for emu in emus:
+        emu.stop()
+
+Emulators can also be run as a separate process, printing the hosts to
+connect to:
+
+    python -m xled_plus.emulator --devices 3 --leds 250 --latency 0.01
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import base64
+import errno
+import json
+import logging
+import math
+import os
+import random
+import socket
+import threading
+import time
+from socketserver import ThreadingMixIn
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+from xled.security import make_challenge_response
+from xled.udp_client import UDPClient
+from xled_plus.highcontrol import HighControlInterface
+
+log = logging.getLogger(__name__)
+
+RT_PORT = 7777
+API_PREFIX = "/xled/v1/"
+TOKEN_LIFETIME = 14400
+
+# Next loopback address to try for an emulator without a given address
+next_address = [2]
+address_lock = threading.Lock()
+
+
+def parse_version(txt):
+    return tuple(map(int, txt.split(".")))
+
+
+def grid_layout(num_leds):
+    """
+    Returns layout coordinates for the leds placed row by row in a square
+    grid, back and forth as a string of leds is usually hung.
+
+    :rtype: list
+    """
+    width = max(1, int(num_leds ** 0.5 + 0.5))
+    rows = -(-num_leds // width)
+    coords = []
+    for i in range(num_leds):
+        row, col = divmod(i, width)
+        if row % 2:
+            col = width - 1 - col
+        coords.append(
+            {
+                "x": 2.0 * col / (width - 1) - 1.0 if width > 1 else 0.0,
+                "y": 1.0 - float(row) / (rows - 1) if rows > 1 else 0.5,
+                "z": 0.0,
+            }
+        )
+    return coords
+
+
+def synthetic_layout(num_leds, dim=2):
+    """
+    Returns the layout source and coordinates of a synthetic layout: a
+    straight line for dim 1, a grid (see grid_layout) for dim 2, and a
+    cone shaped spiral like lights on a tree for dim 3.
+
+    :rtype: tuple
+    """
+    if dim == 1:
+        return "linear", [
+            {"x": float(i) / max(1, num_leds - 1), "y": 0.0, "z": 0.0}
+            for i in range(num_leds)
+        ]
+    elif dim == 2:
+        return "2d", grid_layout(num_leds)
+    elif dim == 3:
+        coords = []
+        for i in range(num_leds):
+            t = float(i) / max(1, num_leds - 1)
+            ang = 2.0 * math.pi * 12.0 * t
+            rad = 1.0 - t
+            coords.append(
+                {"x": rad * math.cos(ang), "y": t, "z": rad * math.sin(ang)}
+            )
+        return "3d", coords
+    raise ValueError("Layout dimension must be 1, 2 or 3")
+
+
+class EmulatedDevice(object):
+    """
+    State and behaviour of one emulated device, independent of the network.
+
+    :param int leds: number of leds
+    :param str profile: led profile, "RGB" or "RGBW"
+    :param str firmware: firmware version, e.g "2.8.3". Versions below 2
+        give a generation I device, with family "D"
+    :param str family: firmware family, by default "D" for generation I and
+        "F" otherwise
+    :param str sync: sync group role, "none", "master" or "slave"
+    :param str group: name of the sync group
+    :param str mac: hardware address, by default a random one
+    :param int capacity: movie capacity in frames, by default what fits in
+        one megabyte
+    :param int max_movies: maximum number of movies
+    :param list layout: led coordinates as dicts with "x", "y" and "z", by
+        default a synthetic layout
+    :param int dim: dimension of the synthetic layout, see synthetic_layout
+    :param float latency: delay in seconds before each HTTP response
+    :param float jitter: random extra delay in seconds, up to this amount
+    :param float http_loss: fraction of HTTP requests that get no response
+    :param float rt_loss: fraction of real time datagrams that are lost
+    :param seed: seed of the random generator for jitter and loss
+    """
+
+    def __init__(
+        self,
+        leds=250,
+        profile="RGB",
+        firmware="2.8.3",
+        family=None,
+        sync="none",
+        group="group",
+        mac=None,
+        capacity=None,
+        max_movies=15,
+        layout=None,
+        dim=2,
+        latency=0.0,
+        jitter=0.0,
+        http_loss=0.0,
+        rt_loss=0.0,
+        seed=None,
+    ):
+        self.num_leds = leds
+        self.led_profile = profile.upper()
+        self.led_bytes = len(self.led_profile)
+        self.firmware = firmware
+        self.version = parse_version(firmware)
+        self.family = family or ("D" if self.version < (2, 0, 0) else "F")
+        self.sync = sync
+        self.group = group
+        if mac is None:
+            mac = ":".join("{:02x}".format(b) for b in os.urandom(6))
+        self.mac = mac
+        self.frame_size = leds * self.led_bytes
+        self.capacity = capacity or max(1, (1 << 20) // self.frame_size)
+        self.max_movies = max_movies
+        if layout:
+            self.layout_source = "3d"
+            self.layout = layout
+        else:
+            self.layout_source, self.layout = synthetic_layout(leds, dim)
+        self.latency = latency
+        self.jitter = jitter
+        self.http_loss = http_loss
+        self.rt_loss = rt_loss
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.mode = "movie"
+        self.master = None
+        self.name = "Emulated-" + mac.replace(":", "")[-6:]
+        self.movies = []
+        self.next_id = 0
+        self.pending_movie = None
+        self.current_movie = None
+        self.playlist = []
+        self.current_entry = None
+        self.movie_config = {"frame_delay": 1000, "frames_number": 0}
+        self.movie_data = b""
+        self.rt_frame = None
+        self.rt_received = 0
+        self.last_frame = None
+        self.routes = {
+            ("GET", "gestalt"): self.get_gestalt,
+            ("GET", "fw/version"): self.get_fw_version,
+            ("GET", "status"): self.get_status,
+            ("GET", "device_name"): self.get_device_name,
+            ("POST", "device_name"): self.set_device_name,
+            ("GET", "led/config"): self.get_led_config,
+            ("GET", "led/layout/full"): self.get_layout,
+            ("POST", "led/layout/full"): self.set_layout,
+            ("GET", "led/mode"): self.get_mode,
+            ("POST", "led/mode"): self.set_mode,
+            ("GET", "led/movie/config"): self.get_movie_config,
+            ("POST", "led/movie/config"): self.set_movie_config,
+            ("POST", "led/movie/full"): self.set_movie_full,
+            ("POST", "led/rt/frame"): self.set_rt_frame_rest,
+        }
+        if self.family != "D" and self.version >= (2, 5, 6):
+            self.routes.update(
+                {
+                    ("GET", "movies"): self.get_movies,
+                    ("DELETE", "movies"): self.delete_movies,
+                    ("POST", "movies/new"): self.set_movies_new,
+                    ("POST", "movies/full"): self.set_movies_full,
+                    ("GET", "movies/current"): self.get_movies_current,
+                    ("POST", "movies/current"): self.set_movies_current,
+                    ("GET", "playlist"): self.get_playlist,
+                    ("POST", "playlist"): self.set_playlist,
+                    ("DELETE", "playlist"): self.delete_playlist,
+                    ("GET", "playlist/current"): self.get_playlist_current,
+                    ("POST", "playlist/current"): self.set_playlist_current,
+                }
+            )
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.counts = {
+                "requests": 0,
+                "http_lost": 0,
+                "unauthorized": 0,
+                "upload_bytes": 0,
+                "upload_time": 0.0,
+                "uploads": 0,
+                "rt_packets": 0,
+                "rt_bytes": 0,
+                "rt_lost": 0,
+                "rt_rejected": 0,
+                "rt_frames": 0,
+                "rt_incomplete": 0,
+            }
+            self.rt_first_time = None
+            self.rt_last_time = None
+
+    def count(self, name, num=1):
+        with self.lock:
+            self.counts[name] += num
+
+    def stats(self):
+        """
+        Returns a dict with counts of the received HTTP requests, movie
+        uploads and real time datagrams and frames, and the upload rate in
+        bytes per second and the rate of completed real time frames.
+
+        :rtype: dict
+        """
+        with self.lock:
+            res = dict(self.counts)
+            first, last = self.rt_first_time, self.rt_last_time
+        res["upload_rate"] = (
+            res["upload_bytes"] / res["upload_time"] if res["upload_time"] else 0.0
+        )
+        if first is not None and last > first:
+            res["rt_fps"] = (res["rt_frames"] - 1) / (last - first)
+        else:
+            res["rt_fps"] = 0.0
+        return res
+
+    # Handling of HTTP requests
+
+    def request(self, method, path, token, body, start):
+        """
+        Handles one REST request. Returns the HTTP status and a dict to send
+        as json, or (None, None) if the request is to be lost.
+
+        :param str method: "GET", "POST" or "DELETE"
+        :param str path: the requested path
+        :param str token: the X-Auth-Token header, or None
+        :param bytes body: the request body
+        :param float start: time when the request was received
+        :rtype: tuple
+        """
+        self.count("requests")
+        delay = self.latency + self.jitter * self.random.random()
+        if delay > 0.0:
+            time.sleep(delay)
+        if self.http_loss and self.random.random() < self.http_loss:
+            self.count("http_lost")
+            return None, None
+        path = urlsplit(path).path
+        if not path.startswith(API_PREFIX):
+            return 404, {}
+        name = path[len(API_PREFIX) :]
+        if method == "POST" and name == "login":
+            return 200, self.login(body)
+        elif method == "POST" and name == "verify":
+            return self.verify(token)
+        elif not self.token_valid(token):
+            self.count("unauthorized")
+            return 401, {}
+        func = self.routes.get((method, name))
+        if func is None:
+            return 404, {}
+        if name in ("movies/full", "led/movie/full", "led/rt/frame"):
+            res = func(body, start)
+        else:
+            res = func(json.loads(body.decode()) if body else {})
+        if "code" not in res:
+            res["code"] = 1000
+        return 200, res
+
+    def login(self, body):
+        challenge = base64.b64decode(json.loads(body.decode())["challenge"])
+        token = base64.b64encode(os.urandom(8)).decode()
+        with self.lock:
+            self.tokens[token] = (False, time.time() + TOKEN_LIFETIME)
+        return {
+            "authentication_token": token,
+            "authentication_token_expires_in": TOKEN_LIFETIME,
+            "challenge-response": make_challenge_response(challenge, self.mac),
+            "code": 1000,
+        }
+
+    def verify(self, token):
+        with self.lock:
+            if token not in self.tokens:
+                return 401, {}
+            self.tokens[token] = (True, self.tokens[token][1])
+        return 200, {"code": 1000}
+
+    def token_valid(self, token):
+        with self.lock:
+            entry = self.tokens.get(token)
+            if entry is None or not entry[0]:
+                return False
+            if entry[1] < time.time():
+                del self.tokens[token]
+                return False
+            return True
+
+    def get_gestalt(self, data):
+        res = {
+            "product_name": "Twinkly",
+            "hardware_version": "100" if self.family != "D" else "6",
+            "flash_size": 64,
+            "led_type": 14,
+            "product_code": "TWEMU",
+            "fw_family": self.family,
+            "device_name": self.name,
+            "uptime": "0",
+            "mac": self.mac,
+            "uuid": "00000000-0000-0000-0000-" + self.mac.replace(":", ""),
+            "max_supported_led": max(self.num_leds, 1200),
+            "number_of_led": self.num_leds,
+            "frame_rate": 25,
+            "movie_capacity": self.capacity,
+        }
+        if self.family != "D":
+            res["led_profile"] = self.led_profile
+            res["bytes_per_led"] = self.led_bytes
+            res["max_movies"] = self.max_movies
+        return res
+
+    def get_fw_version(self, data):
+        return {"version": self.firmware}
+
+    def get_status(self, data):
+        return {}
+
+    def get_device_name(self, data):
+        return {"name": self.name}
+
+    def set_device_name(self, data):
+        self.name = data["name"]
+        return {}
+
+    def get_led_config(self, data):
+        return {"strings": [{"first_led_id": 0, "length": self.num_leds}]}
+
+    def get_layout(self, data):
+        return {
+            "source": self.layout_source,
+            "synthesized": False,
+            "coordinates": self.layout,
+        }
+
+    def set_layout(self, data):
+        self.layout = data["coordinates"]
+        self.layout_source = data["source"]
+        return {}
+
+    def current_mode(self):
+        # Slaves in a sync group follow the mode of the master
+        return self.master.mode if self.master is not None else self.mode
+
+    def get_mode(self, data):
+        res = {"mode": self.current_mode(), "shop_mode": 0}
+        if self.mode == "movie" and self.current_movie is not None:
+            res["id"] = self.current_movie["id"]
+        return res
+
+    def set_mode(self, data):
+        mode = data["mode"]
+        if mode not in ("movie", "playlist", "rt", "demo", "effect", "color", "off"):
+            return {"code": 1104}
+        with self.lock:
+            self.mode = mode
+        return {}
+
+    def get_movie_config(self, data):
+        return {
+            "frame_delay": self.movie_config["frame_delay"],
+            "leds_number": self.num_leds,
+            "frames_number": self.movie_config["frames_number"],
+            "loop_type": 0,
+            "sync": {
+                "mode": self.sync,
+                "master_id": self.group if self.sync != "none" else "",
+                "slave_id": self.group if self.sync == "slave" else "",
+                "compat_mode": 0,
+            },
+        }
+
+    def set_movie_config(self, data):
+        self.movie_config = {
+            "frame_delay": data["frame_delay"],
+            "frames_number": data["frames_number"],
+        }
+        return {}
+
+    def record_upload(self, body, start):
+        with self.lock:
+            self.counts["uploads"] += 1
+            self.counts["upload_bytes"] += len(body)
+            self.counts["upload_time"] += time.time() - start
+
+    def set_movie_full(self, body, start):
+        self.record_upload(body, start)
+        if len(body) != self.movie_config["frames_number"] * self.frame_size:
+            return {"code": 1105}
+        self.movie_data = body
+        return {"frames_number": self.movie_config["frames_number"]}
+
+    def used_frames(self):
+        return sum(movie["frames_number"] for movie in self.movies)
+
+    def get_movies(self, data):
+        return {
+            "movies": [
+                dict((k, v) for k, v in movie.items() if k != "data")
+                for movie in self.movies
+            ],
+            "available_frames": self.capacity - self.used_frames(),
+            "max_capacity": self.capacity,
+        }
+
+    def delete_movies(self, data):
+        self.movies = []
+        self.playlist = []
+        self.current_movie = None
+        self.current_entry = None
+        if self.mode in ("movie", "playlist"):
+            self.mode = "effect"
+        return {}
+
+    def set_movies_new(self, data):
+        if (
+            len(self.movies) >= self.max_movies
+            or self.used_frames() + data["frames_number"] > self.capacity
+            or data["leds_per_frame"] != self.num_leds
+            or data["descriptor_type"] != self.led_profile.lower() + "_raw"
+        ):
+            return {"code": 1104}
+        movie = dict(data)
+        movie["id"] = self.next_id
+        self.next_id += 1
+        self.pending_movie = movie
+        return {"id": movie["id"]}
+
+    def set_movies_full(self, body, start):
+        self.record_upload(body, start)
+        movie = self.pending_movie
+        if movie is None or len(body) != movie["frames_number"] * self.frame_size:
+            return {"code": 1105}
+        self.pending_movie = None
+        movie["data"] = body
+        self.movies.append(movie)
+        if self.current_movie is None:
+            self.current_movie = movie
+        return {"frames_number": movie["frames_number"]}
+
+    def find_movie(self, key, value):
+        for movie in self.movies:
+            if movie[key] == value:
+                return movie
+        return None
+
+    def get_movies_current(self, data):
+        movie = self.current_movie
+        if movie is None:
+            return {"id": -1, "unique_id": "", "name": "", "code": 1102}
+        return {
+            "id": movie["id"],
+            "unique_id": movie["unique_id"],
+            "name": movie["name"],
+        }
+
+    def set_movies_current(self, data):
+        movie = self.find_movie("id", data["id"])
+        if movie is None:
+            return {"code": 1104}
+        self.current_movie = movie
+        return {}
+
+    def get_playlist(self, data):
+        return {
+            "unique_id": "00000000-0000-0000-0000-000000000000",
+            "name": "playlist",
+            "entries": [
+                {
+                    "id": i,
+                    "handle": self.find_movie("unique_id", entry["unique_id"])["id"],
+                    "unique_id": entry["unique_id"],
+                    "duration": entry["duration"],
+                }
+                for i, entry in enumerate(self.playlist)
+            ],
+        }
+
+    def set_playlist(self, data):
+        for entry in data["entries"]:
+            if self.find_movie("unique_id", entry["unique_id"]) is None:
+                return {"code": 1104}
+        self.playlist = [dict(entry) for entry in data["entries"]]
+        self.current_entry = 0 if self.playlist else None
+        return {}
+
+    def delete_playlist(self, data):
+        self.playlist = []
+        self.current_entry = None
+        return {}
+
+    def get_playlist_current(self, data):
+        if self.current_entry is None:
+            return {"id": -1, "unique_id": "", "name": "", "code": 1102}
+        uid = self.playlist[self.current_entry]["unique_id"]
+        return {
+            "id": self.current_entry,
+            "unique_id": uid,
+            "name": self.find_movie("unique_id", uid)["name"],
+        }
+
+    def set_playlist_current(self, data):
+        if not 0 <= data["id"] < len(self.playlist):
+            return {"code": 1104}
+        self.current_entry = data["id"]
+        return {}
+
+    def set_rt_frame_rest(self, body, start):
+        if len(body) != self.frame_size:
+            return {"code": 1105}
+        self.show_rt_frame(bytes(body))
+        return {}
+
+    # Handling of real time datagrams
+
+    def rt_token_valid(self, raw):
+        return self.token_valid(base64.b64encode(bytes(raw)).decode())
+
+    def datagram(self, data):
+        """
+        Handles one real time datagram in protocol version 1, 2 or 3.
+        Frames sent in version 3 are assembled from their fragments, and
+        a frame is shown when all its fragments are received.
+
+        :param bytes data: the datagram
+        """
+        self.count("rt_packets")
+        self.count("rt_bytes", len(data))
+        if self.rt_loss and self.random.random() < self.rt_loss:
+            self.count("rt_lost")
+            return
+        if (
+            len(data) < 10
+            or not self.rt_token_valid(data[1:9])
+            or self.current_mode() != "rt"
+        ):
+            self.count("rt_rejected")
+            return
+        version = data[0]
+        if version in (1, 2):
+            payload = data[10:]
+        elif version == 3 and len(data) >= 12:
+            self.fragment(data[12:], data[11])
+            return
+        else:
+            self.count("rt_rejected")
+            return
+        if len(payload) != self.frame_size:
+            self.count("rt_rejected")
+            return
+        self.show_rt_frame(payload)
+
+    def fragment(self, payload, index):
+        start = index * 900
+        if start + len(payload) > self.frame_size:
+            self.count("rt_rejected")
+            return
+        if index == 0:
+            if self.rt_frame is not None and self.rt_received:
+                self.count("rt_incomplete")
+            self.rt_frame = bytearray(self.frame_size)
+            self.rt_received = 0
+        elif self.rt_frame is None:
+            self.count("rt_incomplete")
+            return
+        self.rt_frame[start : start + len(payload)] = payload
+        self.rt_received += len(payload)
+        if self.rt_received >= self.frame_size:
+            self.show_rt_frame(bytes(self.rt_frame))
+            self.rt_frame = None
+            self.rt_received = 0
+
+    def show_rt_frame(self, frame):
+        now = time.time()
+        with self.lock:
+            self.last_frame = frame
+            self.counts["rt_frames"] += 1
+            if self.rt_first_time is None:
+                self.rt_first_time = now
+            self.rt_last_time = now
+
+
+class DeviceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "TwinklyEmulator/1.0"
+
+    def do_GET(self):
+        self.handle_api("GET")
+
+    def do_POST(self):
+        self.handle_api("POST")
+
+    def do_DELETE(self):
+        self.handle_api("DELETE")
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(parts)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def handle_api(self, method):
+        start = time.time()
+        body = self.read_body()
+        status, res = self.server.device.request(
+            method, self.path, self.headers.get("X-Auth-Token"), body, start
+        )
+        if status is None:
+            self.close_connection = True
+            return
+        data = json.dumps(res).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug("%s: " + format, self.address_string(), *args)
+
+
+class DeviceHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Emulator(object):
+    """
+    An emulated device listening on the network. Keyword arguments are
+    passed to EmulatedDevice.
+
+    :param str address: loopback address to listen on, by default the next
+        free one from 127.0.0.2
+    :param int port: HTTP port, by default any free port
+    :param int rt_port: UDP port for real time frames
+    """
+
+    def __init__(self, address=None, port=0, rt_port=RT_PORT, **kwargs):
+        self.device = EmulatedDevice(**kwargs)
+        self.address = address
+        self.port = port
+        self.rt_port = rt_port
+        self.httpd = None
+        self.udp = None
+        self.threads = []
+        self.stopped = False
+
+    @property
+    def host(self):
+        """
+        The host to give to HighControlInterface or connect, with the HTTP
+        port unless it is 80.
+        """
+        if self.port == 80:
+            return self.address
+        return "{}:{}".format(self.address, self.port)
+
+    def bind(self, address):
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            udp.bind((address, self.rt_port))
+            udp.settimeout(0.2)
+            httpd = DeviceHTTPServer((address, self.port), DeviceRequestHandler)
+        except Exception:
+            udp.close()
+            raise
+        self.udp = udp
+        self.httpd = httpd
+        self.httpd.device = self.device
+        self.address = address
+        self.port = self.httpd.server_address[1]
+
+    def start(self):
+        """
+        Starts serving in background threads.
+        """
+        self.stopped = False
+        if self.address is not None:
+            self.bind(self.address)
+        else:
+            with address_lock:
+                while True:
+                    if next_address[0] > 254:
+                        raise RuntimeError("No free loopback address for emulator")
+                    address = "127.0.0.{}".format(next_address[0])
+                    next_address[0] += 1
+                    try:
+                        self.bind(address)
+                        break
+                    except socket.error as err:
+                        if err.errno != errno.EADDRINUSE:
+                            raise
+        self.threads = [
+            threading.Thread(target=self.httpd.serve_forever),
+            threading.Thread(target=self.receive),
+        ]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def receive(self):
+        udp = self.udp
+        buf = bytearray(2048)
+        while not self.stopped:
+            try:
+                num = udp.recv_into(buf)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.device.datagram(bytes(buf[:num]))
+
+    def stop(self):
+        """
+        Stops serving and closes the sockets.
+        """
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        self.stopped = True
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.udp is not None:
+            self.udp.close()
+            self.udp = None
+
+    def stats(self):
+        return self.device.stats()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def start_group(num, **kwargs):
+    """
+    Starts num emulators forming a sync group, with the first as master.
+    Keyword arguments are passed to EmulatedDevice.
+
+    :rtype: list
+    """
+    if num == 1:
+        return [Emulator(**kwargs).start()]
+    group = "group-" + base64.b16encode(os.urandom(4)).decode().lower()
+    emus = [
+        Emulator(sync="master" if i == 0 else "slave", group=group, **kwargs)
+        for i in range(num)
+    ]
+    for emu in emus[1:]:
+        emu.device.master = emus[0].device
+    return [emu.start() for emu in emus]
+
+
+class EmulatorSocket(object):
+    """
+    UDP socket which ignores any HTTP port in the host of the destination,
+    since the hosts of emulators include their HTTP port.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def sendto(self, data, *args):
+        (host, port) = args[-1]
+        return self.sock.sendto(data, *(args[:-1] + ((host.split(":")[0], port),)))
+
+    def sendmsg(self, buffers, ancdata, flags, address):
+        (host, port) = address
+        return self.sock.sendmsg(buffers, ancdata, flags, (host.split(":")[0], port))
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class EmulatorUDPClient(UDPClient):
+    """
+    UDP client for real time frames to emulators. It sends from any free
+    local port instead of binding the real time port, which the emulators
+    use on the same machine, and ignores any HTTP port in the destination.
+    """
+
+    @property
+    def handle(self):
+        if self._handle is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(("", 0))
+            self._handle = EmulatorSocket(sock)
+        return self._handle
+
+    def send(self, message):
+        return self.handle.sendto(message, 0, (self.destination_host, self.port))
+
+
+def connect(hosts, parallel=False, rt_port=RT_PORT):
+    """
+    Connects to one or several emulated devices. With one host a
+    HighControlInterface is returned, and with a list of hosts (master first)
+    a MultiHighControlInterface.
+
+    :param hosts: host of an emulator, or list of hosts
+    :param bool parallel: passed to MultiHighControlInterface
+    :param int rt_port: UDP port for real time frames of the emulators
+    """
+    if isinstance(hosts, str):
+        ctr = HighControlInterface(hosts)
+        ctrlst = [ctr]
+    else:
+        from xled_plus.multicontrol import MultiHighControlInterface
+
+        ctr = MultiHighControlInterface(hosts, parallel=parallel)
+        ctrlst = [ctr] + ctr.ctrlst
+    client = EmulatorUDPClient(rt_port, ctr.host)
+    for c in ctrlst:
+        c._udpclient = client
+    return ctr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run emulated Twinkly devices")
+    parser.add_argument("--devices", type=int, default=1, help="number of devices")
+    parser.add_argument("--leds", type=int, default=250, help="leds per device")
+    parser.add_argument("--profile", default="RGB", help="RGB or RGBW")
+    parser.add_argument("--firmware", default="2.8.3", help="firmware version")
+    parser.add_argument("--dim", type=int, default=2, help="layout dimension")
+    parser.add_argument("--port", type=int, default=0, help="HTTP port")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--http-loss", type=float, default=0.0)
+    parser.add_argument("--rt-loss", type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    emus = start_group(
+        args.devices,
+        port=args.port,
+        leds=args.leds,
+        profile=args.profile,
+        firmware=args.firmware,
+        dim=args.dim,
+        latency=args.latency,
+        jitter=args.jitter,
+        http_loss=args.http_loss,
+        rt_loss=args.rt_loss,
+    )
+    print(" ".join(emu.host for emu in emus))
+    try:
+        while True:
+            time.sleep(10.0)
+            for emu in emus:
+                log.info("%s: %s", emu.host, json.dumps(emu.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for emu in emus:
+            emu.stop()
+
+
+if __name__ == "__main__":
+    main()
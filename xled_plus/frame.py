@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.frame
+~~~~~~~~~~~~~~~
+
+Contiguous frame buffer used to represent patterns.
+
+A Frame keeps all pixels of a single pattern in one bytearray of
+num_leds * led_bytes bytes, laid out exactly as one frame of a movie, so
+it can be written to a movie or sent as a real time frame without any
+joining of per led byte strings.
+
+For compatibility with the older pattern format (a list with one byte
+string per led), indexing and iterating over a Frame gives the byte
+string of each pixel, and a pixel can be replaced by assigning a byte
+string to an index. Use Frame.from_list and Frame.to_list to convert
+between the two formats.
+"""
+
+from __future__ import absolute_import
+
+from itertools import chain
+
+
+def pack_colors(colors, led_bytes=3):
+    """
+    Packs a sequence of rgb tuples into a bytearray with one pixel per color.
+    For led profiles with four bytes per led the white component is set to zero.
+
+    :param colors: sequence of rgb tuples (0 - 255)
+    :param int led_bytes: number of bytes per led (3 or 4)
+    :rtype: bytearray
+    """
+    return pack_rgb(chain.from_iterable(colors), led_bytes)
+
+
+def pack_rgb(values, led_bytes=3):
+    """
+    Packs a flat sequence of r, g, b values, three per led, into a bytearray
+    with one pixel per led.
+
+    :param values: sequence of color components (0 - 255)
+    :param int led_bytes: number of bytes per led (3 or 4)
+    :rtype: bytearray
+    """
+    rgb = bytearray(values)
+    if led_bytes == 4:
+        data = bytearray(len(rgb) // 3 * 4)
+        data[1::4] = rgb[0::3]
+        data[2::4] = rgb[1::3]
+        data[3::4] = rgb[2::3]
+        return data
+    else:
+        return rgb
+
+
+class Frame(object):
+    """
+    One frame pattern stored as a contiguous bytearray.
+
+    :param int num_leds: number of leds in the frame
+    :param int led_bytes: number of bytes per led (3 or 4)
+    :param bytearray buffer: optional pixel data to use (not copied)
+    """
+
+    def __init__(self, num_leds, led_bytes=3, buffer=None):
+        self.num_leds = num_leds
+        self.led_bytes = led_bytes
+        if buffer is None:
+            self.buffer = bytearray(num_leds * led_bytes)
+        else:
+            assert len(buffer) == num_leds * led_bytes
+            self.buffer = buffer
+
+    @classmethod
+    def from_bytes(cls, data, led_bytes=3):
+        """
+        Creates a frame from a copy of raw pixel data, e.g one frame of a movie.
+        """
+        return cls(len(data) // led_bytes, led_bytes, bytearray(data))
+
+    @classmethod
+    def from_list(cls, pat):
+        """
+        Creates a frame from a pattern in the older list-of-bytes format.
+        """
+        led_bytes = len(pat[0]) if pat else 3
+        return cls(len(pat), led_bytes, bytearray(b"".join(pat)))
+
+    @classmethod
+    def from_colors(cls, colors, led_bytes=3):
+        """
+        Creates a frame from a sequence of rgb tuples, one per led.
+        """
+        data = pack_colors(colors, led_bytes)
+        return cls(len(data) // led_bytes, led_bytes, data)
+
+    @classmethod
+    def from_rgb(cls, values, led_bytes=3):
+        """
+        Creates a frame from a flat sequence of r, g, b values, three per led.
+        """
+        data = pack_rgb(values, led_bytes)
+        return cls(len(data) // led_bytes, led_bytes, data)
+
+    def to_list(self):
+        """
+        Converts the frame to the older list-of-bytes pattern format.
+
+        :rtype: list
+        """
+        lb = self.led_bytes
+        buf = bytes(self.buffer)
+        return [buf[i : i + lb] for i in range(0, len(buf), lb)]
+
+    def tobytes(self):
+        """
+        Returns the raw pixel data of the frame as bytes.
+        """
+        return bytes(self.buffer)
+
+    def view(self):
+        """
+        Returns a memoryview on the pixel data, without copying it.
+        """
+        return memoryview(self.buffer)
+
+    def copy(self):
+        return Frame(self.num_leds, self.led_bytes, bytearray(self.buffer))
+
+    def set_pixel(self, ind, rgb):
+        """
+        Sets the color of one led in place.
+
+        :param int ind: led index
+        :param tuple rgb: color as an rgb tuple
+        """
+        lb = self.led_bytes
+        if lb == 4:
+            self.buffer[ind * 4 : ind * 4 + 4] = bytearray((0, rgb[0], rgb[1], rgb[2]))
+        else:
+            self.buffer[ind * lb : ind * lb + 3] = bytearray(rgb[0:3])
+
+    def get_rgb(self, ind):
+        """
+        Returns the color of one led as an rgb tuple.
+        """
+        off = (ind + 1) * self.led_bytes - 3
+        return tuple(self.buffer[off : off + 3])
+
+    def __len__(self):
+        return self.num_leds
+
+    def __getitem__(self, ind):
+        lb = self.led_bytes
+        if isinstance(ind, slice):
+            return [
+                bytes(self.buffer[i * lb : i * lb + lb])
+                for i in range(*ind.indices(self.num_leds))
+            ]
+        if ind < 0:
+            ind += self.num_leds
+        if not 0 <= ind < self.num_leds:
+            raise IndexError("frame index out of range")
+        return bytes(self.buffer[ind * lb : ind * lb + lb])
+
+    def __setitem__(self, ind, pix):
+        lb = self.led_bytes
+        if ind < 0:
+            ind += self.num_leds
+        if not 0 <= ind < self.num_leds or len(pix) != lb:
+            raise IndexError("frame index out of range or bad pixel size")
+        self.buffer[ind * lb : ind * lb + lb] = pix
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __eq__(self, other):
+        if isinstance(other, Frame):
+            return self.led_bytes == other.led_bytes and self.buffer == other.buffer
+        elif isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        res = self.__eq__(other)
+        return res if res is NotImplemented else not res
+
+    __hash__ = None
+
+    def __bytes__(self):
+        return bytes(self.buffer)
+
+    def __repr__(self):
+        return "Frame({}, {})".format(self.num_leds, self.led_bytes)
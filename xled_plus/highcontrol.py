@@ -18,14 +18,26 @@ import binascii
 import time
 import uuid
 import datetime
+import hashlib
 import math as m
-from operator import xor
+from operator import itemgetter, xor
 
 from xled.control import ControlInterface
 from xled.util import date_from_seconds_after_midnight, seconds_after_midnight
 from xled.security import sha1sum
 from xled.exceptions import HighInterfaceError
 
+from xled_plus.frame import Frame
+from xled_plus.moviefile import (
+    MovieFile,
+    MovieSegment,
+    convert_movie,
+    is_movie_file,
+    parse_fps,
+    write_movie_file,
+)
+from xled_plus.render import RenderStream
+
 log = logging.getLogger(__name__)
 
 #: Time format as defined by C standard
@@ -65,7 +77,12 @@ class HighControlInterface(ControlInterface):
             self.hw_address = info["mac"]
         self.layout = False
         self.layout_bounds = False
+        self._layout_coords = {}
+        self._layout_coords_src = False
+        self.layout_digest = False
         self.last_rt_time = 0
+        self.metrics = None  # FrameMetrics timing show_rt_frame, if set
+        self.gather_cache = collections.OrderedDict()
         self.curr_mode = self.get_mode()["mode"]
         if self.curr_mode != "off" and self.curr_mode != "rt":
             self.last_mode = self.curr_mode
@@ -394,7 +411,7 @@ class HighControlInterface(ControlInterface):
         Switches to movie mode if necessary.
         The parameter is a pattern object eg created with make_solid_pattern or make_func_pattern.
 
-        :param pat: list of byte strings representing a single frame pattern
+        :param pat: Frame (or list of byte strings) representing a single frame pattern
         """
         self.show_movie(self.to_movie(pat), 1)
 
@@ -445,8 +462,13 @@ class HighControlInterface(ControlInterface):
 
         :param frame: a pattern or file-like object representing the frame
         """
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
         if self.is_pattern(frame):
             frame = self.to_movie(frame)
+        if metrics is not None:
+            packed = time.perf_counter()
         if self.curr_mode != "rt" or self.last_rt_time + 50.0 < time.time():
             self.set_mode("rt")
         else:
@@ -459,6 +481,8 @@ class HighControlInterface(ControlInterface):
             self.set_rt_frame_socket(frame, 2)
         else:
             self.set_rt_frame_socket(frame, 3)
+        if metrics is not None:
+            metrics.sent(packed - start, time.perf_counter() - packed)
 
     def show_effect(self, effect_id):
         """
@@ -541,25 +565,56 @@ class HighControlInterface(ControlInterface):
 
     def is_pattern(self, pat):
         """
-        Checks whether the given argument has the format of a single frame pattern.
+        Checks whether the given argument has the format of a single frame pattern,
+        either a Frame or a list of byte strings in the older format.
 
         :param pat: object to check whether it is a pattern
         :rtype: bool
         """
+        if isinstance(pat, Frame):
+            return len(pat) == self.num_leds
         return (
             isinstance(pat, list)
             and len(pat) == self.num_leds
             and isinstance(pat[0], bytes)
         )
 
+    def to_frame(self, pat):
+        """
+        Returns the pattern as a Frame. A Frame is returned as is, whereas a
+        pattern in the older list format, or raw frame bytes, are converted.
+
+        :param pat: object representing the pattern
+        :rtype: Frame
+        """
+        if isinstance(pat, Frame):
+            return pat
+        elif isinstance(pat, list):
+            return Frame.from_list(pat)
+        else:
+            return Frame.from_bytes(pat, self.led_bytes)
+
+    def to_pattern_list(self, pat):
+        """
+        Returns the pattern in the older list format, with one byte string per led.
+
+        :param pat: object representing the pattern
+        :rtype: list
+        """
+        if isinstance(pat, Frame):
+            return pat.to_list()
+        return list(pat)
+
     def is_movie(self, movie):
         """
-        Checks whether the given argument has the format of a movie.
+        Checks whether the given argument has the format of a movie: a
+        BytesIO, a MovieSegment (e.g from load_movie), or a RenderStream
+        (from Effect.make_movie).
 
         :param movie: object to check whether it is a movie
         :rtype: bool
         """
-        return isinstance(movie, io.BytesIO)
+        return isinstance(movie, (io.BytesIO, MovieSegment, RenderStream))
 
     def add_to_movie(self, movie, pat):
         """
@@ -571,7 +626,7 @@ class HighControlInterface(ControlInterface):
         """
         assert self.is_pattern(pat)
         movie.seek(0, 2)
-        movie.write(b"".join(pat))
+        movie.write(pat.buffer if isinstance(pat, Frame) else b"".join(pat))
         movie.seek(0, 0)
 
     def to_movie(self, patlst):
@@ -586,7 +641,11 @@ class HighControlInterface(ControlInterface):
             for ele in patlst:
                 if isinstance(ele, list):
                     ele = b"".join(ele)
+                elif isinstance(ele, Frame):
+                    ele = ele.buffer
                 movie.write(ele)
+        elif isinstance(patlst, Frame):
+            movie.write(patlst.buffer)
         else:
             movie.write(patlst)
         movie.seek(0)
@@ -606,6 +665,40 @@ class HighControlInterface(ControlInterface):
         else:
             return ind
 
+    def circular_buffer(self, buf):
+        """
+        Internal function returning a copy of a pattern buffer with the leds in
+        the circular order of circind, i.e with the first of two strings
+        reversed. Since circind is its own inverse, it also converts back.
+        """
+        buf = bytearray(buf)
+        if len(self.string_config) == 2:
+            lb = self.led_bytes
+            n1 = self.string_config[0]["length"] * lb
+            for c in range(lb):
+                buf[c:n1:lb] = buf[c:n1:lb][::-1]
+        return buf
+
+    def pixel_gather(self, key, make_index):
+        """
+        Internal function returning a cached function which gathers the pixels
+        of a pattern buffer with a padding pixel appended, such that pixel i of
+        the result is pixel index[i] of the buffer, where index is the list
+        returned by make_index. The index is computed once per key and string
+        configuration, and only the most recently used ones are kept.
+        """
+        key = key + (tuple(s["length"] for s in self.string_config),)
+        getter = self.gather_cache.get(key)
+        if getter is None:
+            lb = self.led_bytes
+            getter = itemgetter(*[k * lb + c for k in make_index() for c in range(lb)])
+            if len(self.gather_cache) >= 16:
+                self.gather_cache.popitem(last=False)
+            self.gather_cache[key] = getter
+        else:
+            self.gather_cache.move_to_end(key)
+        return getter
+
     def make_pixel(self, r, g, b):
         """
         Internal function to produce one pixel of a pattern from given r, g
@@ -627,10 +720,10 @@ class HighControlInterface(ControlInterface):
         Creates a one-colored pattern with the given rgb value tuple.
 
         :param tuple rgb: color as an rgb tuple
-        :rtype: list representing the pattern
+        :rtype: Frame representing the pattern
         """
-        pat = [self.make_pixel(*rgb)] * self.num_leds
-        return pat
+        pix = self.make_pixel(*rgb)
+        return Frame(self.num_leds, self.led_bytes, bytearray(pix * self.num_leds))
 
     def make_func_pattern(self, func, circular=False):
         """
@@ -640,18 +733,25 @@ class HighControlInterface(ControlInterface):
 
         :param function func: function to return the color of each pixel
         :param bool circular: Flip the led indices on two-string devices to enable circular patterns
-        :rtype: list representing the pattern
+        :rtype: Frame representing the pattern
         """
-        pat = [False] * self.num_leds
-        for i in range(self.num_leds):
-            (r, g, b) = func(i)
-            if circular:
-                pat[self.circind(i)] = self.make_pixel(r, g, b)
-            else:
-                pat[i] = self.make_pixel(r, g, b)
-        return pat
+        cols = [func(i) for i in range(self.num_leds)]
+        if circular:
+            cols = [cols[self.circind(i)] for i in range(self.num_leds)]
+        return Frame.from_colors(cols, self.led_bytes)
+
+    def make_rgb_pattern(self, values):
+        """
+        Creates a pattern from a flat sequence of color components, with the
+        r, g and b values of each led in turn.
+
+        :param values: sequence of ints (0 - 255), three per led
+        :rtype: Frame representing the pattern
+        """
+        return Frame.from_rgb(values, self.led_bytes)
 
     def fetch_layout(self, aspect=False):
+        self.layout_digest = False  # The layout may have changed on the device
         if self.family != 'D' and self.version > (2, 2, 1):
             res = self.get_led_layout()
             if res["source"] == "3d":
@@ -768,19 +868,50 @@ class HighControlInterface(ControlInterface):
         return a color as an rgb tuple for that led.
 
         :param function func: function to return the color of each pixel
-        :rtype: list representing the pattern
+        :rtype: Frame representing the pattern
+        """
+        coords = self.get_layout_coords(style)
+        if index:
+            cols = [func(pos, i) for i, pos in enumerate(coords)]
+        else:
+            cols = [func(pos) for pos in coords]
+        return Frame.from_colors(cols, self.led_bytes)
+
+    def make_layout_batch_pattern(self, func, style=None):
+        """
+        Creates a pattern by calling the given function once for all leds.
+        The function is expected to take a list with the physical positions
+        of all leds, transformed according to style in the same way as for
+        make_layout_pattern, and to return a list with one rgb tuple per led.
+        The transformed positions are computed once per layout and style, so
+        this is much faster than make_layout_pattern for moving effects.
+
+        :param function func: function to return the colors of all pixels
+        :param str style: coordinate style, see layout_transform
+        :rtype: Frame representing the pattern
+        """
+        return Frame.from_colors(func(self.get_layout_coords(style)), self.led_bytes)
+
+    def get_layout_coords(self, style=None):
+        """
+        Returns a list with the positions of all leds, transformed according
+        to style (see layout_transform). The list is computed once per style
+        and reused until the layout is changed, e.g by fetch_layout or
+        adjust_layout_aspect. It is shared, so do not modify it.
+
+        :param str style: coordinate style, see layout_transform
+        :rtype: list
         """
         if not self.layout:
             self.fetch_layout()
-        pat = [False] * self.num_leds
-        for i in range(self.num_leds):
-            pos = self.layout_transform(self.layout[i], style)
-            if index:
-                (r, g, b) = func(pos, i)
-            else:
-                (r, g, b) = func(pos)
-            pat[i] = self.make_pixel(r, g, b)
-        return pat
+        if self._layout_coords_src is not self.layout:
+            self._layout_coords = {}
+            self._layout_coords_src = self.layout
+        coords = self._layout_coords.get(style)
+        if coords is None:
+            coords = [self.layout_transform(pos, style) for pos in self.layout]
+            self._layout_coords[style] = coords
+        return coords
 
     def adjust_layout_aspect(self, aspect_xy, aspect_zy=False):
         if aspect_xy and aspect_zy:
@@ -801,9 +932,11 @@ class HighControlInterface(ControlInterface):
         In case you want to make destructive operations on one of them.
 
         :param pat: object representing the pattern
-        :rtype: list representing the pattern
+        :rtype: Frame representing the pattern
         """
-        return [ele for ele in pat]
+        if isinstance(pat, Frame):
+            return pat.copy()
+        return self.to_frame(pat)
 
     def modify_pattern(self, pat, ind, rgb, circular=False):
         """
@@ -814,10 +947,12 @@ class HighControlInterface(ControlInterface):
         :param int ind: led index in the pattern
         :param tuple rgb: color as an rgb tuple
         :param bool circular: Flip the led indices on two-string devices to enable circular patterns
-        :rtype: list representing the pattern (the same object as pat)
+        :rtype: pattern (the same object as pat)
         """
         if circular:
-            pat[self.circind(ind)] = self.make_pixel(*rgb)
+            ind = self.circind(ind)
+        if isinstance(pat, Frame):
+            pat.set_pixel(ind, rgb)
         else:
             pat[ind] = self.make_pixel(*rgb)
         return pat
@@ -831,29 +966,22 @@ class HighControlInterface(ControlInterface):
         :param int step: steps to shift, can be positive or negative
         :param tuple rgb: color as an rgb tuple
         :param bool circular: Flip the led indices on two-string devices to enable circular patterns
-        :rtype: list representing the pattern
+        :rtype: Frame representing the pattern
         """
         pix = self.make_pixel(*rgb)
-        if circular and len(self.string_config) == 2:
-            n1 = self.string_config[0]["length"]
-            n2 = self.num_leds
-            p1 = pat[0:n1]
-            p2 = pat[n1:n2]
-            if step > 0:
-                for i in range(step):
-                    p2 = p1[:1] + p2[:-1]
-                    p1 = p1[1:] + [pix]
-            else:
-                for i in range(-step):
-                    p1 = p2[:1] + p1[:-1]
-                    p2 = p2[1:] + [pix]
-            pat = p1 + p2
+        buf = self.to_frame(pat).buffer
+        lb = self.led_bytes
+        circular = circular and len(self.string_config) == 2
+        if circular:
+            buf = self.circular_buffer(buf)
+        step = max(-self.num_leds, min(self.num_leds, step))
+        if step > 0:
+            buf = pix * step + buf[: -step * lb]
         else:
-            if step > 0:
-                pat = [pix] * step + pat[:-step]
-            else:
-                pat = pat[-step:] + [pix] * -step
-        return pat
+            buf = buf[-step * lb :] + pix * -step
+        if circular:
+            buf = self.circular_buffer(buf)
+        return Frame(self.num_leds, lb, bytearray(buf))
 
     def rotate_pattern(self, pat, step, circular=False):
         """
@@ -864,27 +992,17 @@ class HighControlInterface(ControlInterface):
         :param pat: object representing the pattern
         :param int step: steps to shift, can be positive or negative
         :param bool circular: Flip the led indices on two-string devices to enable circular patterns
-        :rtype: list representing the pattern
+        :rtype: Frame representing the pattern
         """
+        buf = self.to_frame(pat).buffer
+        lb = self.led_bytes
         if circular and len(self.string_config) == 2:
-            n1 = self.string_config[0]["length"]
-            n2 = self.num_leds
-            p1 = pat[0:n1]
-            p2 = pat[n1:n2]
-            if step > 0:
-                for i in range(step):
-                    tmp = p1[0]
-                    p1 = p1[1:] + p2[-1:]
-                    p2 = [tmp] + p2[:-1]
-            else:
-                for i in range(-step):
-                    tmp = p1[-1]
-                    p1 = p2[:1] + p1[:-1]
-                    p2 = p2[1:] + [tmp]
-            pat = p1 + p2
+            step %= self.num_leds
+            buf = self.circular_buffer(buf)
+            buf = self.circular_buffer(buf[-step * lb :] + buf[: -step * lb])
         else:
-            pat = pat[-step:] + pat[:-step]
-        return pat
+            buf = buf[-step * lb :] + buf[: -step * lb]
+        return Frame(self.num_leds, lb, bytearray(buf))
 
     def permute_pattern(self, pat, perm, circular=False):
         """
@@ -895,18 +1013,46 @@ class HighControlInterface(ControlInterface):
         :param pat: object representing the pattern
         :param list perm: permutation list of source indices
         :param bool circular: Flip the led indices on two-string devices to enable circular patterns
-        :rtype: list representing the pattern
+        :rtype: Frame representing the pattern
         """
-        newpat = [False] * len(pat)
-        if circular:
-            for i, k in enumerate(perm):
-                newpat[self.circind(i)] = pat[self.circind(k)]
-        else:
-            for i, k in enumerate(perm):
-                newpat[i] = pat[k]
-        return newpat
+        perm = tuple(perm)
+
+        def make_index():
+            # Leds not reached by perm get the padding pixel, which is black
+            index = [self.num_leds] * self.num_leds
+            if circular:
+                for i, k in enumerate(perm):
+                    index[self.circind(i)] = self.circind(k)
+            else:
+                index[: len(perm)] = perm
+            return index
 
-    def save_movie(self, name, movie, fps):
+        buf = self.to_frame(pat).buffer
+        lb = self.led_bytes
+        gather = self.pixel_gather(("permute", perm, bool(circular)), make_index)
+        return Frame(self.num_leds, lb, bytearray(gather(buf + bytes(lb))))
+
+    def layout_hash(self):
+        """
+        Returns a digest identifying the led layout as reported by the device,
+        independent of any aspect adjustment. It is stored in binary movie
+        files to recognize movies made for another layout.
+
+        :rtype: bytes
+        """
+        if not self.layout_digest:
+            if self.family != "D" and self.version > (2, 2, 1):
+                res = self.get_led_layout()
+                desc = res["source"] + "".join(
+                    "{:.4f},{:.4f},{:.4f};".format(p["x"], p["y"], p.get("z", 0.0))
+                    for p in res["coordinates"]
+                )
+            else:
+                desc = "linear {}".format(self.num_leds)
+            self.layout_digest = hashlib.sha1(desc.encode()).digest()
+        return self.layout_digest
+
+    def save_movie(self, name, movie, fps, binary=False):
         """
         Save the movie object on file.
         The movie file is text based and starts with a header containing
@@ -914,7 +1060,15 @@ class HighControlInterface(ControlInterface):
         the suggested frames per second. After the header follows one line per
         frame as a hexadecimal string. This format makes it easier to share
         movies between different devices and even different led profiles.
+        With binary set to True, the movie is instead saved in the binary
+        format of xled_plus.moviefile, which is half the size and can be
+        memory mapped when loaded.
         """
+        if binary:
+            write_movie_file(
+                name, movie, self.num_leds, self.led_bytes, fps, self.layout_hash()
+            )
+            return
         bytesperframe = self.led_bytes * self.num_leds
         numframes = movie.seek(0, 2) // bytesperframe
         movie.seek(0)
@@ -924,42 +1078,49 @@ class HighControlInterface(ControlInterface):
             f.write(binascii.hexlify(movie.read(bytesperframe)).decode() + "\n")
         f.close()
 
-    def load_movie(self, name):
+    def load_movie(self, name, fit="center", white=False):
         """
-        Read a movie from a file (produced by save_movie).
+        Read a movie from a file (produced by save_movie), in either text or
+        binary format.
         Returns both the movie object and the suggested frames-per-second in a tuple.
-        Some effort is made to convert movies between different devices:
-        If the number of leds are different, each frame is padded or truncated
-        at both ends. If the led profile is different, the white component is
-        removed or added (as zero).
-        """
-        f = open(name, "r")
-        head = list(map(int, f.readline().strip("\n").split(" ")))
-        numframes = head[0]
-        fps = head[3]
-        movie = io.BytesIO()
-        if head[1] == self.num_leds and head[2] == self.led_bytes:
-            for i in range(numframes):
-                movie.write(binascii.unhexlify(f.readline().strip("\n")))
-        else:
-            for i in range(numframes):
-                s = binascii.unhexlify(f.readline().strip("\n"))
-                if head[2] == 3 and self.led_bytes == 4:
-                    s = b"".join(
-                        [chr(0) + s[3 * i : 3 * i + 3] for i in range(len(s) // 3)]
-                    )
-                elif head[2] == 4 and self.led_bytes == 3:
-                    s = b"".join([s[4 * i + 1 : 4 * i + 4] for i in range(len(s) // 4)])
-                if head[1] < self.num_leds:
-                    diff = self.num_leds - head[1]
-                    s = (
-                        chr(0) * (diff // 2 * self.led_bytes)
-                        + s
-                        + chr(0) * ((diff - diff // 2) * self.led_bytes)
+        A binary movie made for this device is not read into memory, but the
+        returned movie object reads directly from the memory mapped file, which
+        stays open until the movie object is closed.
+        Movies made for other devices are converted with moviefile.convert_movie:
+        If the number of leds are different, each frame is by default padded or
+        truncated at both ends, or with fit="resample" stretched to the new
+        number of leds. If the led profile is different, the white component is
+        removed or added as zero, or with white=True extracted from or merged
+        into the rgb components.
+        """
+        if is_movie_file(name):
+            mf = MovieFile(name)
+            if mf.layout_hash and mf.num_leds == self.num_leds:
+                if mf.layout_hash != self.layout_hash():
+                    log.warning("Movie %s was made for a different led layout", name)
+            if mf.num_leds == self.num_leds and mf.led_bytes == self.led_bytes:
+                return (mf.movie(close=True), mf.fps)
+            with mf:
+                with mf.data() as view:
+                    data = convert_movie(
+                        view,
+                        mf.num_leds,
+                        mf.led_bytes,
+                        self.num_leds,
+                        self.led_bytes,
+                        fit,
+                        white,
                     )
-                elif head[1] > self.num_leds:
-                    hdiff = (head[1] - self.num_leds) // 2
-                    s = s[hdiff : hdiff + self.num_leds * self.led_bytes]
-                movie.write(s)
-        movie.seek(0)
-        return (movie, fps)
+            return (io.BytesIO(data), mf.fps)
+        else:
+            with open(name, "r") as f:
+                line = f.readline().split()
+                head = tuple(map(int, line[:3]))
+                fps = parse_fps(line[3])
+                data = b"".join(
+                    binascii.unhexlify(f.readline().strip("\n")) for i in range(head[0])
+                )
+        data = convert_movie(
+            data, head[1], head[2], self.num_leds, self.led_bytes, fit, white
+        )
+        return (io.BytesIO(data), fps)
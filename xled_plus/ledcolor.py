@@ -42,8 +42,15 @@ have a cold purplish tinge when fully lit. The provided color model
 compensates for this by balancing the lights. With this model you
 can easily select any white you want - neutral, warm, cold, pinkish
 or greenish - without the need to go to RGBW.
+
+To convert many colors at once, e.g a whole frame, use hsl_colors(h, s, l)
+with lists of values. With set_color_lut a quantized lookup table can be
+enabled, which makes both hsl_color and hsl_colors much faster at the
+price of a small loss in precision.
 """
 
+from bisect import bisect_left
+
 led_gamma = 1.0
 
 led_brightness = [0.35, 0.50, 0.15]
@@ -60,6 +67,12 @@ col_styles_dict = {
 
 col_style = ("8col", "equilight")
 
+hue_ramp_cache = {}
+
+color_lut_size = False
+
+color_lut = (False, False)
+
 
 # Internal functions
 
@@ -188,36 +201,124 @@ def hsl_color(h, s, l):
     """
     Takes hue (0.0 - 1.0), saturation (0.0 - 1.0), and lightness (-1.0 - 1.0)
     values and converts it to an rgb tuple in the range 0-255.
+    If a color lookup table is enabled with set_color_lut, the color is
+    taken from the table instead of being computed.
 
     :param float h: hue component (0.0 - 1.0)
     :param float s: saturation component (0.0 - 1.0)
     :param float l: lightness component (-1.0 - 1.0)
     :rtype: tuple
     """
-    global col_style, col_styles_dict
-    hramp = col_styles_dict[col_style[0]]
-    ir = 1.0 / led_balance[0]
-    ig = 1.0 / led_balance[1]
-    ib = 1.0 / led_balance[2]
-    irg = min(ir, ig)
-    irb = min(ir, ib)
-    igb = min(ig, ib)
-    iramp = [
-        (0, 0, ib),
-        (0, igb / 2, igb / 2),
-        (0, ig, 0),
-        (irg / 2, irg / 2, 0),
-        (ir, 0, 0),
-        (irb / 2, 0, irb / 2),
-        (0, 0, ib),
+    if color_lut_size:
+        return lut_color(h, s, l)
+    return hsl_color_direct(h, s, l, hue_ramp())
+
+
+def hsl_colors(h, s, l):
+    """
+    Converts lists of hue, saturation and lightness values into a list of
+    rgb tuples, in the same way as hsl_color but without repeating the
+    setup work for each color. Any of the arguments may also be a single
+    number, which is then used for all the colors.
+
+    :param h: hue components (0.0 - 1.0)
+    :param s: saturation components (0.0 - 1.0)
+    :param l: lightness components (-1.0 - 1.0)
+    :rtype: list
+    """
+    n = max([len(x) for x in (h, s, l) if isinstance(x, (list, tuple))] or [1])
+    (h, s, l) = [x if isinstance(x, (list, tuple)) else [x] * n for x in (h, s, l)]
+    if color_lut_size:
+        return list(map(lut_color, h, s, l))
+    ramp = hue_ramp()
+    return [hsl_color_direct(hh, ss, ll, ramp) for hh, ss, ll in zip(h, s, l)]
+
+
+def set_color_lut(size=(128, 9, 65)):
+    """
+    Enables a lookup table for hsl_color and hsl_colors, or disables it if
+    size is False. The table has the given number of steps in hue, saturation
+    and lightness, and colors are taken from the nearest entry. It is built
+    the first time it is used, and again whenever the color style, led
+    balance or gamma has changed.
+
+    :param tuple size: number of hue, saturation and lightness steps, or False
+    """
+    global color_lut_size, color_lut
+    color_lut_size = tuple(size) if size else False
+    color_lut = (False, False)
+
+
+def lut_color(h, s, l):
+    """
+    Returns the rgb tuple for the nearest entry in the color lookup table.
+    """
+    global color_lut
+    (nh, ns, nl) = color_lut_size
+    key = (col_style, led_gamma, led_balance[0], led_balance[1], led_balance[2])
+    if color_lut[0] != key:
+        color_lut = (key, build_color_lut(nh, ns, nl))
+    ih = int(h * nh + 0.5) % nh
+    i_s = int(min(1.0, max(0.0, s)) * (ns - 1) + 0.5)
+    il = int((min(1.0, max(-1.0, l)) + 1.0) * 0.5 * (nl - 1) + 0.5)
+    return color_lut[1][(ih * ns + i_s) * nl + il]
+
+
+def build_color_lut(nh, ns, nl):
+    ramp = hue_ramp()
+    return [
+        hsl_color_direct(
+            float(ih) / nh, float(i_s) / (ns - 1), 2.0 * il / (nl - 1) - 1.0, ramp
+        )
+        for ih in range(nh)
+        for i_s in range(ns)
+        for il in range(nl)
     ]
-    i = 0
-    while h > hramp[i + 1]:
-        i += 1
+
+
+def hue_ramp():
+    """
+    Returns the hue ramp of the current color circle and led balance.
+    It only changes with these settings, so it is cached.
+    """
+    key = (col_style[0], led_balance[0], led_balance[1], led_balance[2])
+    if key not in hue_ramp_cache:
+        hramp = col_styles_dict[col_style[0]]
+        ir = 1.0 / led_balance[0]
+        ig = 1.0 / led_balance[1]
+        ib = 1.0 / led_balance[2]
+        irg = min(ir, ig)
+        irb = min(ir, ib)
+        igb = min(ig, ib)
+        iramp = [
+            (0, 0, ib),
+            (0, igb / 2, igb / 2),
+            (0, ig, 0),
+            (irg / 2, irg / 2, 0),
+            (ir, 0, 0),
+            (irb / 2, 0, irb / 2),
+            (0, 0, ib),
+        ]
+        hue_ramp_cache[key] = (hramp, iramp, ir, ig, ib)
+    return hue_ramp_cache[key]
+
+
+def hsl_color_direct(h, s, l, ramp):
+    """
+    Computes the rgb tuple for an hsl color, given the hue ramp from hue_ramp().
+    """
+    (hramp, iramp, ir, ig, ib) = ramp
+    i = bisect_left(hramp, h, 1) - 1
     p = (h - hramp[i]) / (hramp[i + 1] - hramp[i])
-    (r, g, b) = tuple(map(lambda x1, x2: p * (x2 - x1) + x1, iramp[i], iramp[i + 1]))
+    (r1, g1, b1) = iramp[i]
+    (r2, g2, b2) = iramp[i + 1]
+    r = p * (r2 - r1) + r1
+    g = p * (g2 - g1) + g1
+    b = p * (b2 - b1) + b1
     nrm = max(r / ir, g / ig, b / ib)
-    (r, g, b) = tuple(map(lambda x: x / nrm, (r, g, b)))
+    r = r / nrm
+    g = g / nrm
+    b = b / nrm
     ll = (l + 1.0) * 0.5
     if col_style[1] == "linear":
         if ll < 0.5:
@@ -227,7 +328,7 @@ def hsl_color(h, s, l):
             t1 = 1.0 - l
             t2 = l
     else:
-        br = color_brightness(r, g, b)
+        br = r * led_brightness[0] + g * led_brightness[1] + b * led_brightness[2]
         # make the hue get its maximum dynamic saturation, up till maximum green, then linearly decreasing
         e = max(r, g, b)
         p = min(
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.metrics
+~~~~~~~~~~~~~~~~~
+
+Per frame timing of real time effects.
+
+A FrameMetrics object is set as 'metrics' on a HighControlInterface, most
+easily with Effect.enable_metrics. Then show_rt_frame records how long it
+takes to pack the pattern into a frame and to send it, and the real time
+sessions of xled_plus.effect_base (with RepeatedTimer) and
+xled_plus.rtscheduler record how long getnext takes and how far each frame
+is from its time slot. Frames more than 'tolerance' of a frame interval
+after their time slot are counted as late, and time slots skipped by the
+scheduler as dropped. The timer drift is the time from the ideal start of a
+frame to its actual start.
+
+The latest timings are kept in rolling histograms, summarized by
+FrameMetrics.summary, and an optional callback gets a dict with the timings
+of each frame. Without metrics set, the instrumented code only checks that
+the attribute is None.
+"""
+
+from __future__ import absolute_import
+
+import bisect
+import collections
+import time
+
+
+class RollingHistogram(object):
+    """
+    Distribution of the latest 'history' values of a timing, counted in bins
+    whose upper bounds double from 'first' seconds, with a last bin for all
+    larger values.
+
+    :param int history: number of values to keep
+    :param float first: upper bound of the first bin in seconds
+    :param int nbins: number of bounded bins
+    """
+
+    def __init__(self, history=500, first=0.0001, nbins=14):
+        self.values = collections.deque()
+        self.history = history
+        self.bounds = [first * 2 ** i for i in range(nbins)]
+        self.counts = [0] * (nbins + 1)
+
+    def add(self, value):
+        if len(self.values) >= self.history:
+            old = self.values.popleft()
+            self.counts[bisect.bisect_left(self.bounds, old)] -= 1
+        self.values.append(value)
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def __len__(self):
+        return len(self.values)
+
+    def percentile(self, frac, ordered=None):
+        ordered = ordered or sorted(self.values)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(frac * len(ordered)))]
+
+    def summary(self):
+        """
+        Returns a dict with the number of values, their mean, median, 90th
+        and 99th percentile and maximum, and the histogram as a list of
+        [upper bound, count] with None as the bound of the last bin.
+
+        :rtype: dict
+        """
+        ordered = sorted(self.values)
+        return {
+            "count": len(ordered),
+            "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+            "p50": self.percentile(0.5, ordered),
+            "p90": self.percentile(0.9, ordered),
+            "p99": self.percentile(0.99, ordered),
+            "max": ordered[-1] if ordered else 0.0,
+            "bins": [
+                [bound, count]
+                for bound, count in zip(self.bounds + [None], self.counts)
+            ],
+        }
+
+
+class FrameMetrics(object):
+    """
+    Timings of real time frames.
+
+    :param fps: requested frames per second, used for the time slots
+    :param int history: number of frames kept in the histograms
+    :param callback: function called with a dict of timings for each frame
+    :param float tolerance: how late (as a fraction of the frame interval)
+        a frame may start before it is counted as late
+    """
+
+    timings = ("render", "pack", "send", "total", "interval", "drift")
+
+    def __init__(self, fps=None, history=500, callback=None, tolerance=0.5):
+        self.fps = fps
+        self.callback = callback
+        self.tolerance = tolerance
+        self.histograms = dict(
+            (name, RollingHistogram(history)) for name in self.timings
+        )
+        self.reset()
+
+    def reset(self):
+        for hist in self.histograms.values():
+            hist.values.clear()
+            hist.counts = [0] * len(hist.counts)
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+        self.first_start = None
+        self.last_start = None
+        self.current = None
+
+    def begin_frame(self, due=None):
+        """
+        Marks the start of a frame. Without due, the time slot of the frame
+        is computed from the start of the first frame and the requested fps.
+
+        :param float due: scheduled start of the frame, in time.monotonic()
+        """
+        now = time.monotonic()
+        if self.first_start is None:
+            self.first_start = now
+        if due is None and self.fps:
+            due = self.first_start + (self.frames + self.dropped) / float(self.fps)
+        self.current = {"frame": self.frames, "start": now, "due": due}
+
+    def sent(self, pack, send):
+        """
+        Records the time to pack and send a frame. Called by show_rt_frame,
+        which then also ends the frame if no frame was begun.
+        """
+        if self.current is None:
+            self.begin_frame()
+            self.current.update(pack=pack, send=send)
+            self.end_frame()
+        else:
+            self.current.update(pack=pack, send=send)
+
+    def drop(self, num=1):
+        """
+        Counts time slots that were skipped without sending any frame.
+        """
+        self.dropped += num
+
+    def end_frame(self, **stages):
+        """
+        Marks the end of a frame, with any further timings given as keyword
+        arguments, e.g render.
+        """
+        rec = self.current
+        if rec is None:
+            return
+        self.current = None
+        rec.update(stages)
+        now = time.monotonic()
+        rec["total"] = now - rec["start"]
+        if rec["due"] is not None:
+            rec["drift"] = rec["start"] - rec["due"]
+            rec["late"] = bool(self.fps) and rec["drift"] > self.tolerance / self.fps
+            if rec["late"]:
+                self.late += 1
+        if self.last_start is not None:
+            rec["interval"] = rec["start"] - self.last_start
+        self.last_start = rec["start"]
+        self.frames += 1
+        for name in self.timings:
+            if name in rec:
+                self.histograms[name].add(rec[name])
+        if self.callback:
+            self.callback(rec)
+
+    def achieved_fps(self):
+        if self.frames < 2 or self.last_start <= self.first_start:
+            return 0.0
+        return (self.frames - 1) / (self.last_start - self.first_start)
+
+    def summary(self):
+        """
+        Returns a dict with the frame counts, the requested and achieved fps,
+        and the summary of each timing histogram (in seconds).
+
+        :rtype: dict
+        """
+        res = {
+            "frames": self.frames,
+            "late": self.late,
+            "dropped": self.dropped,
+            "requested_fps": self.fps,
+            "achieved_fps": self.achieved_fps(),
+        }
+        for name in self.timings:
+            res[name] = self.histograms[name].summary()
+        return res
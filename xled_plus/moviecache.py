@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.moviecache
+~~~~~~~~~~~~~~~~~~~~
+
+On-disk cache of rendered effect movies.
+
+A MovieCache stores rendered movies as binary movie files (see
+xled_plus.moviefile) named by a digest of everything that determines the
+movie: the effect class and its code, the arguments the effect was created
+with, the current state of the effect (including shapes added or vectors
+set after it was created), the random seed, the number of frames, the
+number of leds and bytes per led, the led coordinates as currently adjusted
+to the aspect ratio, and the color settings of xled_plus.ledcolor. The total
+size of the cache is kept below a limit by removing the least recently used
+movies.
+
+The cache is used by Effect.launch_movie and Effect.save_movie when the
+effect (or the Effect class) has a 'movie_cache' set, e.g:
+
+    Effect.movie_cache = MovieCache()
+
+Note that an effect without a seed which draws random numbers is cached
+as the movie from its first rendering. Effects with arguments or state that
+can not be identified reliably, such as objects of extension types, are never
+cached. Rendering a movie for the cache leaves the effect in the state it
+had before, just as when the movie is found in the cache.
+"""
+
+from __future__ import absolute_import
+
+import contextlib
+import hashlib
+import os
+import types
+
+from xled_plus import ledcolor
+from xled_plus.frame import Frame
+from xled_plus.moviefile import MovieFile, write_movie_file
+
+CACHE_VERSION = 2
+
+
+class UncacheableError(TypeError):
+    pass
+
+
+def cache_token(obj, effect=None, active=None):
+    """
+    Returns a string identifying the value of obj, which is the same in every
+    run of the program for equal values. Objects of classes defined in
+    Python are identified by their class and attributes.
+
+    :raises UncacheableError: if obj can not be identified reliably
+    :rtype: str
+    """
+    if obj is effect and effect is not None:
+        return "self"
+    elif obj is None or isinstance(obj, (bool, int, float, str, bytes)):
+        return repr(obj)
+    elif isinstance(obj, (list, tuple)):
+        return "{}({})".format(
+            type(obj).__name__, ",".join(cache_token(x, effect, active) for x in obj)
+        )
+    elif isinstance(obj, dict):
+        return "dict({})".format(
+            ",".join(
+                cache_token(k, effect, active) + ":" + cache_token(v, effect, active)
+                for k, v in sorted(obj.items(), key=lambda kv: repr(kv[0]))
+            )
+        )
+    elif isinstance(obj, (set, frozenset)):
+        return "set({})".format(
+            ",".join(sorted(cache_token(x, effect, active) for x in obj))
+        )
+    elif isinstance(obj, Frame):
+        return "Frame({},{})".format(obj.led_bytes, hashlib.sha1(obj.buffer).hexdigest())
+    elif isinstance(obj, bytearray):
+        return "bytearray({})".format(hashlib.sha1(obj).hexdigest())
+    elif isinstance(obj, types.FunctionType):
+        return function_token(obj, effect, active)
+    elif isinstance(obj, types.MethodType):
+        return "{}.{}".format(
+            cache_token(obj.__self__, effect, active),
+            function_token(obj.__func__, effect, active),
+        )
+    elif hasattr(obj, "num_leds") and hasattr(obj, "show_rt_frame"):
+        return "ctr"  # The controller is identified by its leds and layout
+    elif isinstance(getattr(obj, "__dict__", None), dict) and isinstance(
+        type(obj).__dict__.get("__module__"), str
+    ):
+        return object_token(obj, effect, active)
+    raise UncacheableError("Can not identify {!r}".format(obj))
+
+
+def object_token(obj, effect=None, active=None):
+    """
+    Identifies an object of a class defined in Python, e.g a shape, by its
+    class and its attributes.
+    """
+    with visiting(obj, active) as active:
+        return "{}({})".format(
+            class_token(type(obj)), cache_token(vars(obj), effect, active)
+        )
+
+
+@contextlib.contextmanager
+def visiting(obj, active):
+    """
+    Keeps track of the objects being identified, to refuse recursive ones.
+    """
+    active = active if active is not None else set()
+    if id(obj) in active:
+        raise UncacheableError("Can not identify recursive {!r}".format(obj))
+    active.add(id(obj))
+    try:
+        yield active
+    finally:
+        active.discard(id(obj))
+
+
+def state_token(effect):
+    """
+    Identifies the current state of an effect by its attributes, except the
+    controller and other resources in its 'shared_state', and the bookkeeping
+    of the movie cache itself.
+    """
+    skip = set(effect.shared_state) | set(("init_args", "movie_cache"))
+    state = dict((k, v) for k, v in vars(effect).items() if k not in skip)
+    return cache_token(state, effect, set([id(effect)]))
+
+
+def layout_token(ctr):
+    """
+    Identifies the led coordinates as used by the controller when rendering,
+    i.e after any adjustment of the aspect ratio.
+    """
+    if not ctr.layout:
+        ctr.fetch_layout()
+    return hashlib.sha1(repr(ctr.layout).encode()).hexdigest()
+
+
+def code_token(code):
+    consts = [
+        code_token(c) if isinstance(c, types.CodeType) else repr(c)
+        for c in code.co_consts
+    ]
+    return hashlib.sha1(code.co_code + repr((consts, code.co_names)).encode()).hexdigest()
+
+
+def function_token(func, effect=None, active=None):
+    parts = [func.__module__, getattr(func, "__qualname__", func.__name__)]
+    parts.append(code_token(func.__code__))
+    with visiting(func, active) as active:
+        if func.__defaults__:
+            parts.append(cache_token(func.__defaults__, effect, active))
+        if func.__closure__:
+            parts.append(
+                ",".join(cell_token(cell, effect, active) for cell in func.__closure__)
+            )
+    return "function({})".format(",".join(parts))
+
+
+def cell_token(cell, effect=None, active=None):
+    try:
+        contents = cell.cell_contents
+    except ValueError:
+        return "empty"  # A variable never assigned in the enclosing function
+    return cache_token(contents, effect, active)
+
+
+def class_token(cls):
+    """
+    Identifies a class by its name and the code of its methods and those
+    of its base classes, so that changed effect code gives new cache keys.
+    """
+    parts = []
+    for klass in cls.__mro__:
+        if klass is object:
+            continue
+        parts.append(klass.__module__ + "." + klass.__name__)
+        for name, val in sorted(vars(klass).items()):
+            if isinstance(val, (staticmethod, classmethod)):
+                val = val.__func__
+            if isinstance(val, types.FunctionType):
+                parts.append(name + ":" + code_token(val.__code__))
+    return ";".join(parts)
+
+
+def color_token():
+    return cache_token(
+        (
+            ledcolor.get_color_style(),
+            ledcolor.led_gamma,
+            ledcolor.led_brightness,
+            ledcolor.led_balance,
+            ledcolor.color_lut_size,
+        )
+    )
+
+
+class MovieCache(object):
+    """
+    Size-bounded on-disk cache of rendered movies.
+
+    :param str directory: where to keep the movies, by default
+        ~/.cache/xled_plus/movies
+    :param int max_size: maximum total size of the cached movies in bytes
+    """
+
+    def __init__(self, directory=None, max_size=500 * 1024 * 1024):
+        if directory is None:
+            directory = os.path.join(
+                os.path.expanduser("~"), ".cache", "xled_plus", "movies"
+            )
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, effect, numframes):
+        """
+        Returns the cache key of a movie of the effect with numframes frames,
+        or None if the effect can not be cached.
+
+        :rtype: str
+        """
+        ctr = effect.ctr
+        try:
+            args, kwargs = getattr(effect, "init_args", ((), {}))
+            parts = [
+                "xled_plus movie {}".format(CACHE_VERSION),
+                class_token(type(effect)),
+                cache_token(args, effect),
+                cache_token(kwargs, effect),
+                cache_token(
+                    [getattr(effect, name, None) for name in effect.cache_attrs], effect
+                ),
+                state_token(effect),
+                cache_token((effect.seed, numframes, ctr.num_leds, ctr.led_bytes)),
+                layout_token(ctr),
+                color_token(),
+            ]
+        except UncacheableError:
+            return None
+        return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".xmov")
+
+    def get(self, key):
+        """
+        Returns the cached movie file with the given key, or None.
+
+        :rtype: MovieFile
+        """
+        name = self.path(key)
+        try:
+            os.utime(name, None)  # Mark as recently used
+            return MovieFile(name)
+        except (OSError, IOError, ValueError):
+            return None
+
+    def put(self, key, movie, num_leds, led_bytes, fps, layout_hash=None):
+        """
+        Stores a movie under the given key, and removes the least recently
+        used movies if the cache has grown too large.
+        """
+        name = self.path(key)
+        tmpname = "{}.{}.tmp".format(name, os.getpid())
+        write_movie_file(tmpname, movie, num_leds, led_bytes, fps, layout_hash)
+        os.replace(tmpname, name)
+        self.evict(keep=name)
+
+    def entries(self):
+        """
+        Returns a list of (last used time, size, file name) for the cached
+        movies, least recently used first.
+
+        :rtype: list
+        """
+        res = []
+        for fname in os.listdir(self.directory):
+            if fname.endswith(".xmov"):
+                name = os.path.join(self.directory, fname)
+                try:
+                    st = os.stat(name)
+                except OSError:
+                    continue
+                res.append((st.st_mtime, st.st_size, name))
+        res.sort()
+        return res
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for (tm, size, name) in entries)
+        for (tm, size, name) in entries:
+            if total <= self.max_size:
+                break
+            if name != keep:
+                try:
+                    os.remove(name)
+                    total -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        for (tm, size, name) in self.entries():
+            os.remove(name)
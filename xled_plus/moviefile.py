@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.moviefile
+~~~~~~~~~~~~~~~~~~~
+
+Binary movie files, as an alternative to the hexadecimal text format of
+HighControlInterface.save_movie.
+
+A binary movie file starts with a fixed size header, followed by the raw
+frame data exactly as it is uploaded to the device. The header contains a
+magic string, the format version, the size of the header, the number of
+frames, the number of leds, the number of bytes per led, the suggested
+frames per second, and a digest of the led layout the movie was made for
+(all zeros if unknown). All integers are little endian.
+
+Since the frame data is stored raw, a movie file is half the size of the
+text format, and it can be memory mapped by MovieFile and streamed to the
+device without reading it all into memory.
+
+The functions text_to_binary and binary_to_text convert between the two
+formats, one frame at a time.
+
+The function convert_movie adapts a whole movie to a device with another
+number of leds or another led profile. It works on all frames at once, by
+copying each byte position of the frames as one strided slice.
+"""
+
+from __future__ import absolute_import
+
+import binascii
+import mmap
+import shutil
+import struct
+from itertools import repeat
+from operator import add, sub
+
+MAGIC = b"XLEDMOVI"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHHIIHxxd20s")
+HEADER_SIZE = 64  # Header is padded to this size
+NO_LAYOUT = b"\x00" * 20
+
+
+class MovieSegment(object):
+    """
+    Read-only file-like object over movie data given as a list of
+    memoryviews, e.g one per frame, or a single view on a memory mapped
+    file. Reads that fit within one view return a view without copying
+    the data. Closing the segment releases the views, and closes the owner
+    of the data if there is one, e.g the MovieFile it was mapped from.
+
+    :param chunks: list of memoryviews with the data
+    :param owner: object with a close method, to close with the segment
+    """
+
+    def __init__(self, chunks, owner=None):
+        self.chunks = chunks
+        self.owner = owner
+        self.size = sum(len(ch) for ch in chunks)
+        self.ind = 0
+        self.offset = 0
+        self.pos = 0
+
+    def __len__(self):
+        return self.size
+
+    def getbuffer(self):
+        """
+        Returns a memoryview on all the data, which is only copied if it
+        consists of several views.
+        """
+        if len(self.chunks) == 1:
+            return self.chunks[0]
+        return memoryview(b"".join(self.chunks))
+
+    def getvalue(self):
+        return bytes(self.getbuffer())
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size
+        pos = max(0, min(self.size, pos))
+        self.pos = self.ind = self.offset = 0
+        self.advance(pos)
+        return self.pos
+
+    def advance(self, num):
+        self.pos += num
+        self.offset += num
+        while self.ind < len(self.chunks) and self.offset >= len(self.chunks[self.ind]):
+            self.offset -= len(self.chunks[self.ind])
+            self.ind += 1
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.pos
+        size = min(size, self.size - self.pos)
+        if size == 0:
+            return b""
+        chunk = self.chunks[self.ind]
+        if self.offset + size <= len(chunk):
+            res = chunk[self.offset : self.offset + size]
+            self.advance(size)
+            return res
+        parts = []
+        while size > 0:
+            chunk = self.chunks[self.ind]
+            num = min(size, len(chunk) - self.offset)
+            parts.append(chunk[self.offset : self.offset + num])
+            size -= num
+            self.advance(num)
+        return b"".join(parts)
+
+    def close(self):
+        chunks, self.chunks = self.chunks, []
+        for chunk in chunks:
+            if isinstance(chunk, memoryview):
+                chunk.release()
+        self.size = self.pos = self.ind = self.offset = 0
+        if self.owner is not None:
+            self.owner.close()
+            self.owner = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def parse_fps(txt):
+    """
+    Returns the frames per second as an int if it is integral, else as a float.
+    """
+    fps = float(txt)
+    return int(fps) if fps == int(fps) else fps
+
+
+def is_movie_file(name):
+    """
+    Checks whether the named file is a binary movie file.
+
+    :rtype: bool
+    """
+    with open(name, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_movie_header(f):
+    """
+    Reads the header of a binary movie file from the open file f.
+    Returns a dict with the keys 'version', 'header_size', 'frames', 'leds',
+    'led_bytes', 'fps', and 'layout_hash' (None if unknown).
+
+    :raises ValueError: if it is not a movie file of a supported version
+    :rtype: dict
+    """
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size or data[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary movie file")
+    (magic, version, hsize, frames, leds, lbytes, fps, lhash) = HEADER.unpack(data)
+    if version > FORMAT_VERSION:
+        raise ValueError("Unsupported movie file version {}".format(version))
+    return {
+        "version": version,
+        "header_size": hsize,
+        "frames": frames,
+        "leds": leds,
+        "led_bytes": lbytes,
+        "fps": parse_fps(fps),
+        "layout_hash": lhash if lhash != NO_LAYOUT else None,
+    }
+
+
+def write_movie_header(f, numframes, num_leds, led_bytes, fps, layout_hash=None):
+    head = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        HEADER_SIZE,
+        numframes,
+        num_leds,
+        led_bytes,
+        fps,
+        layout_hash or NO_LAYOUT,
+    )
+    f.write(head + b"\x00" * (HEADER_SIZE - len(head)))
+
+
+def write_movie_file(name, movie, num_leds, led_bytes, fps, layout_hash=None):
+    """
+    Writes a movie to a binary movie file. The movie data is copied to the
+    file in blocks, so it is never duplicated in memory.
+
+    :param str name: file name
+    :param movie: file-like object that points to the movie
+    :param int num_leds: number of leds in each frame
+    :param int led_bytes: number of bytes per led
+    :param fps: suggested frames per second
+    :param bytes layout_hash: optional digest of the led layout
+    """
+    numframes = movie.seek(0, 2) // (num_leds * led_bytes)
+    movie.seek(0)
+    with open(name, "wb") as f:
+        write_movie_header(f, numframes, num_leds, led_bytes, fps, layout_hash)
+        shutil.copyfileobj(movie, f)
+
+
+class MovieFile(object):
+    """
+    A binary movie file opened for reading, with the frame data memory mapped.
+    The header fields are available as the attributes 'numframes', 'num_leds',
+    'led_bytes', 'fps' and 'layout_hash'.
+
+    Movies and frames obtained from the file refer directly to the mapped
+    memory. If any of them is still in use when the file is closed, the
+    mapping is kept until the last of them is released.
+
+    :param str name: file name
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.file = open(name, "rb")
+        try:
+            head = read_movie_header(self.file)
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+        self.numframes = head["frames"]
+        self.num_leds = head["leds"]
+        self.led_bytes = head["led_bytes"]
+        self.fps = head["fps"]
+        self.layout_hash = head["layout_hash"]
+        self.frame_size = self.num_leds * self.led_bytes
+        self.offset = head["header_size"]
+        if len(self.map) < self.offset + self.numframes * self.frame_size:
+            self.close()
+            raise ValueError("Truncated movie file {}".format(name))
+
+    def data(self):
+        """
+        Returns a memoryview on the frame data of the whole movie.
+        """
+        end = self.offset + self.numframes * self.frame_size
+        return memoryview(self.map)[self.offset : end]
+
+    def frame(self, ind):
+        """
+        Returns a memoryview on the data of frame number ind.
+        """
+        start = self.offset + ind * self.frame_size
+        return memoryview(self.map)[start : start + self.frame_size]
+
+    def movie(self, close=False):
+        """
+        Returns a file-like movie object reading directly from the mapped file,
+        which can be given to e.g HighControlInterface.show_movie.
+
+        :param bool close: whether closing the movie also closes the file
+        :rtype: MovieSegment
+        """
+        return MovieSegment([self.data()], self if close else None)
+
+    def close(self):
+        self.file.close()
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # Views on the map are still in use, it is unmapped with them
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def led_index_map(leds, new_leds, fit="center"):
+    """
+    Returns a list with the source led index for each led in a frame with
+    new_leds leds, or None for leds that should be dark.
+    With fit "center" the frame is padded or truncated equally at both ends,
+    with "start" it is padded or truncated at the end, and with "resample"
+    the frame is stretched or shrunk to the new number of leds.
+
+    :rtype: list
+    """
+    if fit == "resample":
+        return [int((j + 0.5) * leds / new_leds) for j in range(new_leds)]
+    elif fit == "center":
+        shift = (new_leds - leds) // 2
+    elif fit == "start":
+        shift = 0
+    else:
+        raise ValueError("Unknown fit {}".format(fit))
+    return [j - shift if 0 <= j - shift < leds else None for j in range(new_leds)]
+
+
+def remap_leds(data, leds, led_bytes, new_leds, fit="center"):
+    """
+    Changes the number of leds in all frames of the movie data, according
+    to led_index_map. Each byte position of the new frames is copied from
+    all frames at once.
+
+    :param data: bytes-like object with the movie data
+    :rtype: bytearray
+    """
+    framelen = leds * led_bytes
+    newlen = new_leds * led_bytes
+    numframes = len(data) // framelen if framelen else 0
+    data = memoryview(data)[: numframes * framelen]
+    out = bytearray(numframes * newlen)
+    for j, i in enumerate(led_index_map(leds, new_leds, fit)):
+        if i is not None:
+            for c in range(led_bytes):
+                out[j * led_bytes + c :: newlen] = data[i * led_bytes + c :: framelen]
+    return out
+
+
+def convert_profile(data, led_bytes, new_led_bytes, white=False):
+    """
+    Converts movie data between 3 (rgb) and 4 (wrgb) bytes per led.
+    Without white, the white component is set to zero or dropped. With white,
+    the common part of the rgb components is moved to the white component,
+    or the white component is added back to the rgb components.
+
+    :param data: bytes-like object with the movie data
+    :rtype: bytearray
+    """
+    if led_bytes == 3 and new_led_bytes == 4:
+        out = bytearray(len(data) // 3 * 4)
+        rgb = [data[c::3] for c in range(3)]
+        if white:
+            w = bytes(map(min, *rgb))
+            out[0::4] = w
+            rgb = [bytes(map(sub, col, w)) for col in rgb]
+        for c in range(3):
+            out[c + 1 :: 4] = rgb[c]
+    elif led_bytes == 4 and new_led_bytes == 3:
+        out = bytearray(len(data) // 4 * 3)
+        if white:
+            w = data[0::4]
+            for c in range(3):
+                out[c::3] = bytes(map(min, map(add, data[c + 1 :: 4], w), repeat(255)))
+        else:
+            for c in range(3):
+                out[c::3] = data[c + 1 :: 4]
+    elif led_bytes == new_led_bytes:
+        out = bytearray(data)
+    else:
+        raise ValueError(
+            "Can not convert from {} to {} bytes per led".format(led_bytes, new_led_bytes)
+        )
+    return out
+
+
+def convert_movie(
+    data, leds, led_bytes, new_leds, new_led_bytes, fit="center", white=False
+):
+    """
+    Adapts movie data to a device with another number of leds and/or another
+    led profile, working on all frames at once.
+
+    :param data: bytes-like object with the movie data
+    :param int leds: number of leds in the movie
+    :param int led_bytes: number of bytes per led in the movie
+    :param int new_leds: number of leds of the device
+    :param int new_led_bytes: number of bytes per led of the device
+    :param str fit: "center", "start" or "resample", see led_index_map
+    :param bool white: whether to extract or merge the white component
+    :rtype: bytearray
+    """
+    if leds != new_leds:
+        data = remap_leds(data, leds, led_bytes, new_leds, fit)
+    return convert_profile(data, led_bytes, new_led_bytes, white)
+
+
+def text_to_binary(src, dst, layout_hash=None):
+    """
+    Converts a movie file in the text format of save_movie to a binary movie
+    file, one frame at a time.
+
+    :param str src: name of text movie file
+    :param str dst: name of binary movie file to create
+    :param bytes layout_hash: optional digest of the led layout
+    """
+    with open(src, "r") as fin:
+        head = fin.readline().split()
+        numframes, num_leds, led_bytes = map(int, head[:3])
+        with open(dst, "wb") as fout:
+            write_movie_header(
+                fout, numframes, num_leds, led_bytes, parse_fps(head[3]), layout_hash
+            )
+            for i in range(numframes):
+                fout.write(binascii.unhexlify(fin.readline().strip("\n")))
+
+
+def binary_to_text(src, dst):
+    """
+    Converts a binary movie file to the text format of save_movie, one frame
+    at a time.
+
+    :param str src: name of binary movie file
+    :param str dst: name of text movie file to create
+    """
+    with MovieFile(src) as mf:
+        with open(dst, "w") as fout:
+            fout.write(
+                "{} {} {} {}\n".format(mf.numframes, mf.num_leds, mf.led_bytes, mf.fps)
+            )
+            for i in range(mf.numframes):
+                frame = mf.frame(i)
+                fout.write(binascii.hexlify(frame).decode() + "\n")
+                frame.release()
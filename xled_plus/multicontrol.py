@@ -13,7 +13,6 @@ in the same way as a normal HighControlInterface.
 
 from __future__ import absolute_import
 
-import io
 import struct
 import binascii
 import time
@@ -21,9 +20,13 @@ import uuid
 
 import struct
 import base64
+from concurrent.futures import ThreadPoolExecutor
 
 from xled.control import ControlInterface
+from xled.exceptions import HighInterfaceError
 from xled_plus.highcontrol import HighControlInterface
+from xled_plus.frame import Frame
+from xled_plus.moviefile import MovieSegment
 
 
 def pick_master_and_slaves(hostlst):
@@ -44,12 +47,58 @@ def pick_master_and_slaves(hostlst):
     return master, slaves
 
 
+class FanoutReport(object):
+    """
+    Outcome of one operation performed on all devices in a group: the total
+    time, the time for each device, and the exception raised by any failing
+    device, both keyed by host.
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self.times = {}
+        self.errors = {}
+
+    @property
+    def slowest(self):
+        """
+        The host of the device that took the longest time, or None.
+        """
+        return max(self.times, key=self.times.get) if self.times else None
+
+    def ok(self):
+        return not self.errors
+
+    def summary(self):
+        """
+        Returns a dict with the total time, the slowest device and its time,
+        and the failing hosts with their error messages.
+
+        :rtype: dict
+        """
+        slowest = self.slowest
+        return {
+            "total": self.total,
+            "slowest": slowest,
+            "slowest_time": self.times[slowest] if slowest else 0.0,
+            "failures": dict((host, str(err)) for host, err in self.errors.items()),
+        }
+
+
 class MultiHighControlInterface(HighControlInterface):
     """
     High level interface to control a group of joined devices in sync
+
+    With parallel set to True, movies are uploaded to all devices concurrently
+    in a thread pool, and real time frames are sent to all devices in one burst
+    of datagrams. The outcome of the latest such operation is kept in
+    last_fanout as a FanoutReport. The thread pool is shut down by close().
+
+    :param hostlst: list of ip-addresses of the devices, master first
+    :param bool parallel: whether to address the devices concurrently
     """
 
-    def __init__(self, hostlst):
+    def __init__(self, hostlst, parallel=False):
         master, slaves = pick_master_and_slaves(hostlst)
         super(MultiHighControlInterface, self).__init__(master.host)
         self.ctrlst = [master] + slaves
@@ -60,20 +109,112 @@ class MultiHighControlInterface(HighControlInterface):
         self.max_movies = min([info["max_movies"] if "max_movies" in info else 15 for info in infolst])
         for ctr in slaves:
             ctr._udpclient = self.udpclient
+        self.parallel = parallel
+        self.pool = None
+        self.last_fanout = None
+        self.split_plan = (False, False)
+        self.rt_headers = {}
+
+    def fan_out(self, func, argslst):
+        """
+        Calls func(ctr, *args) for each device in the group with the
+        corresponding arguments from argslst, concurrently if parallel is set.
+        Returns a FanoutReport which is also stored in last_fanout, and raises
+        HighInterfaceError if any device failed, after all devices are done.
+
+        :param func: function to call with a ControlInterface as first argument
+        :param argslst: list of argument tuples, one per device
+        :rtype: FanoutReport
+        """
+
+        def timed_call(ctr, args):
+            start = time.time()
+            try:
+                func(ctr, *args)
+                err = None
+            except Exception as e:
+                err = e
+            return ctr.host, time.time() - start, err
+
+        report = FanoutReport()
+        start = time.time()
+        if self.parallel:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(len(self.ctrlst))
+            results = list(self.pool.map(timed_call, self.ctrlst, argslst))
+        else:
+            results = list(map(timed_call, self.ctrlst, argslst))
+        report.total = time.time() - start
+        for host, dur, err in results:
+            report.times[host] = dur
+            if err is not None:
+                report.errors[host] = err
+        self.last_fanout = report
+        if not report.ok():
+            msg = "Failed on {} of {} devices: {}".format(
+                len(report.errors),
+                len(self.ctrlst),
+                ", ".join(
+                    "{} ({})".format(host, err) for host, err in report.errors.items()
+                ),
+            )
+            raise HighInterfaceError(msg)
+        return report
+
+    def close(self):
+        """
+        Shuts down the thread pool used when parallel is set. It is created
+        again if the group is addressed in parallel later.
+        """
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def __del__(self):
+        pool = getattr(self, "pool", None)
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def get_split_plan(self):
+        """
+        Returns the byte ranges of each device within one frame, computed
+        once per combination of device sizes and led profile.
+
+        :rtype: list
+        """
+        key = (tuple(self.nledslst), self.led_bytes)
+        if self.split_plan[0] != key:
+            plan = []
+            start = 0
+            for nleds in self.nledslst:
+                plan.append((start, start + nleds * self.led_bytes))
+                start += nleds * self.led_bytes
+            self.split_plan = (key, plan)
+        return self.split_plan[1]
 
     def split_movie(self, movie):
-        # return a list of one movie per connected device
-        lst = [io.BytesIO() for ctr in self.ctrlst]
-        blens = [nleds * self.led_bytes for nleds in self.nledslst]
+        """
+        Returns a list of one movie per connected device, as MovieSegment
+        objects viewing the data of the original movie without copying it.
+
+        :param movie: file-like object, Frame, or bytes-like object with the movie
+        :rtype: list
+        """
+        if isinstance(movie, Frame):
+            buf = movie.view()
+        elif hasattr(movie, "getbuffer"):
+            buf = movie.getbuffer()
+        elif hasattr(movie, "read"):
+            movie.seek(0)
+            buf = memoryview(movie.read())
+        else:
+            buf = memoryview(movie)
         totlen = self.num_leds * self.led_bytes
-        num = movie.seek(0, 2) // totlen
-        movie.seek(0)
-        for i in range(num):
-            for mov, blen in zip(lst, blens):
-                mov.write(movie.read(blen))
-        for mov in lst:
-            mov.seek(0)
-        return lst
+        offsets = range(0, len(buf) - totlen + 1, totlen)
+        return [
+            MovieSegment([buf[off + start : off + end] for off in offsets])
+            for start, end in self.get_split_plan()
+        ]
 
     def show_movie(self, movie_or_id, fps=None, name=""):
         """
@@ -139,9 +280,12 @@ class MultiHighControlInterface(HighControlInterface):
         numframes = movie.seek(0, 2) // (self.led_bytes * self.num_leds)
         movielst = self.split_movie(movie)
         if self.family == "D" or self.version < (2, 5, 6):
-            for ctr, mov, nled in zip(self.ctrlst, movielst, self.nledslst):
+
+            def upload(ctr, mov, nled):
                 ctr.set_led_movie_config(1000 // fps, numframes, nled)
                 ctr.set_led_movie_full(mov)
+
+            self.fan_out(upload, list(zip(movielst, self.nledslst)))
             return 0
         else:
             res = self.get_movies()
@@ -156,8 +300,10 @@ class MultiHighControlInterface(HighControlInterface):
             if self.curr_mode == "movie":
                 oldid = self.get_movies_current()["id"]
             uid = str(uuid.uuid4())
-            for ctr, mov, nled in zip(self.ctrlst, movielst, self.nledslst):
-                res = ctr.set_movies_new(
+            reslst = [None] * len(self.ctrlst)
+
+            def upload(ctr, ind, mov, nled):
+                reslst[ind] = ctr.set_movies_new(
                     name,
                     uid,
                     self.led_profile.lower() + "_raw",
@@ -166,9 +312,13 @@ class MultiHighControlInterface(HighControlInterface):
                     fps,
                 )
                 ctr.set_movies_full(mov)
+
+            self.fan_out(
+                upload, list(zip(range(len(self.ctrlst)), movielst, self.nledslst))
+            )
             if self.curr_mode == "movie":
                 self.set_movies_current(oldid)  # Dont change currently shown movie
-            return res["id"]
+            return reslst[-1]["id"]
 
     def show_rt_frame(self, frame):
         """
@@ -178,22 +328,107 @@ class MultiHighControlInterface(HighControlInterface):
 
         :param frame: a pattern or file-like object representing the frame
         """
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
         if self.is_pattern(frame):
-            frame = self.to_movie(frame)
+            frame = self.to_frame(frame)
         framelst = self.split_movie(frame)
+        if metrics is not None:
+            packed = time.perf_counter()
         if self.curr_mode != "rt" or self.last_rt_time + 50.0 < time.time():
             self.set_mode("rt")
         else:
             self.last_rt_time = time.time()
-        for ctr, mov, nled in zip(self.ctrlst, framelst, self.nledslst):
-            self.udpclient.destination_host = ctr.host
+        if self.parallel:
+            self.send_rt_burst(framelst)
+        else:
+            for ctr, mov, nled in zip(self.ctrlst, framelst, self.nledslst):
+                self.udpclient.destination_host = ctr.host
+                if self.family == "D":
+                    ctr.set_rt_frame_socket(mov, 1, nled)
+                elif self.version < (2, 4, 14):
+                    ctr.set_rt_frame_socket(mov, 2)
+                else:
+                    ctr.set_rt_frame_socket(mov, 3)
+            self.udpclient.destination_host = self.host
+        if metrics is not None:
+            metrics.sent(packed - start, time.perf_counter() - packed)
+
+    def rt_headers_for(self, ctr, nled, size):
+        """
+        Returns the headers of the real time datagrams for one device, in the
+        same protocol version as ControlInterface.set_rt_frame_socket would
+        use. They are kept until the access token or frame size changes.
+        """
+        token = ctr.session.access_token
+        key = (token, nled, size, self.family, self.version)
+        entry = self.rt_headers.get(ctr.host)
+        if entry is None or entry[0] != key:
+            token = base64.b64decode(token)
             if self.family == "D":
-                ctr.set_rt_frame_socket(mov, 1, nled)
+                headers = [b"\x01" + token + struct.pack(">B", nled)]
             elif self.version < (2, 4, 14):
-                ctr.set_rt_frame_socket(mov, 2)
+                headers = [b"\x02" + token + b"\x00"]
             else:
-                ctr.set_rt_frame_socket(mov, 3)
-        self.udpclient.destination_host = self.host
+                headers = [
+                    b"\x03" + token + b"\x00\x00" + struct.pack(">B", i)
+                    for i in range((size + 899) // 900)
+                ]
+            entry = (key, headers)
+            self.rt_headers[ctr.host] = entry
+        return entry[1]
+
+    def rt_packets(self, ctr, data, nled):
+        """
+        Returns the real time datagrams for one device as a list of
+        (header, data) pairs, where the data are views on the frame.
+        """
+        data = memoryview(data)
+        headers = self.rt_headers_for(ctr, nled, len(data))
+        if len(headers) == 1:
+            return [(headers[0], data)]
+        return [
+            (header, data[i * 900 : i * 900 + 900]) for i, header in enumerate(headers)
+        ]
+
+    def send_rt_burst(self, framelst):
+        """
+        Sends the split real time frame to all devices in one burst, addressing
+        each datagram directly instead of redirecting the shared udp client.
+        All datagrams are prepared before the first one is sent, to keep the
+        devices as close in time as possible. Headers and frame data are sent
+        with scatter/gather where available, so the frame is not copied.
+        Failures are recorded per device in last_fanout but not raised, since
+        a lost real time frame is replaced by the next one anyway.
+
+        :param framelst: list of file-like objects, one frame per device
+        """
+        report = FanoutReport()
+        start = time.time()
+        bursts = []
+        for ctr, mov, nled in zip(self.ctrlst, framelst, self.nledslst):
+            try:
+                bursts.append((ctr.host, self.rt_packets(ctr, mov.read(), nled)))
+            except Exception as err:
+                report.errors[ctr.host] = err
+        sock = self.udpclient.handle
+        port = self.udpclient.port
+        gather = hasattr(sock, "sendmsg")
+        for host, packets in bursts:
+            t0 = time.time()
+            try:
+                for packet in packets:
+                    if gather:
+                        sock.sendmsg(packet, (), 0, (host, port))
+                    else:
+                        sock.sendto(b"".join(packet), (host, port))
+            except Exception as err:
+                report.errors[host] = err
+            report.times[host] = time.time() - t0
+        report.total = time.time() - start
+        self.last_fanout = report
+        return report
 
     #def show_playlist(self, lst_or_id, duration):
     #    for ctr in self.ctrlst:
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.render
+~~~~~~~~~~~~~~~~
+
+Rendering of effects into movies.
+
+A RenderStream renders the frames of an effect directly into one
+preallocated buffer, which is the only copy of the movie in memory. It is a
+file-like object, so it can be given to HighControlInterface.show_movie,
+upload_movie or save_movie like any other movie. When rendered in the
+background, reading from the stream only waits for the frames that are
+read, so the first part of the movie can be sent to the device while the
+rest of it is still being rendered.
+
+The function render_parallel instead splits the movie into chunks which are
+rendered in separate processes. The effect is first advanced through the
+movie with its fast_forward method, taking a checkpoint at the start of each
+chunk, and each process restores a checkpoint and renders its chunk. This
+gives exactly the same movie as rendering it serially.
+"""
+
+from __future__ import absolute_import
+
+import multiprocessing
+import random
+import threading
+
+from xled_plus.frame import Frame
+from xled_plus.moviefile import MovieSegment
+
+# Effect, checkpoints and chunk bounds, inherited by forked render processes
+render_job = None
+
+
+def pattern_bytes(pat):
+    """
+    Returns the pixel data of a pattern, without copying it if it is a Frame.
+    """
+    if isinstance(pat, Frame):
+        return pat.buffer
+    elif isinstance(pat, list):
+        return b"".join(pat)
+    else:
+        return pat
+
+
+class RenderStream(object):
+    """
+    File-like movie of an effect, rendered into a preallocated buffer.
+
+    :param effect: the Effect to render
+    :param int numframes: number of frames in the movie
+    :param bool background: whether to render in a background thread, or
+        else when the frames are read
+    """
+
+    def __init__(self, effect, numframes, background=False):
+        self.frame_size = effect.ctr.num_leds * effect.ctr.led_bytes
+        self.numframes = numframes
+        self.size = numframes * self.frame_size
+        self.buffer = bytearray(self.size)
+        self.frames = self.generate(effect, numframes)
+        self.rendered = 0
+        self.pos = 0
+        self.error = None
+        self.cond = threading.Condition()
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.render_all)
+            self.thread.daemon = True
+            self.thread.start()
+
+    @staticmethod
+    def generate(effect, numframes):
+        if effect.seed is not None:
+            random.seed(effect.seed)
+        effect.reset(numframes)
+        for i in range(numframes):
+            yield effect.getnext()
+
+    def render_frame(self):
+        data = pattern_bytes(next(self.frames))
+        assert len(data) == self.frame_size, "Frame {} has {} bytes, not {}".format(
+            self.rendered, len(data), self.frame_size
+        )
+        start = self.rendered * self.frame_size
+        self.buffer[start : start + self.frame_size] = data
+        with self.cond:
+            self.rendered += 1
+            self.cond.notify_all()
+
+    def render_all(self):
+        try:
+            while self.rendered < self.numframes:
+                self.render_frame()
+        except Exception as err:
+            with self.cond:
+                self.error = err
+                self.cond.notify_all()
+
+    def wait_for(self, end):
+        """
+        Waits until the data up to byte position end is rendered.
+        """
+        needed = min(self.numframes, -(-end // self.frame_size))
+        if self.thread is None:
+            while self.rendered < needed:
+                self.render_frame()
+        else:
+            with self.cond:
+                while self.rendered < needed and self.error is None:
+                    self.cond.wait()
+        if self.error is not None and self.rendered < needed:
+            raise self.error
+
+    def __len__(self):
+        return self.size
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size
+        self.pos = max(0, min(self.size, pos))
+        return self.pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.pos
+        end = min(self.size, self.pos + size)
+        self.wait_for(end)
+        res = memoryview(self.buffer)[self.pos : end]
+        self.pos = end
+        return res
+
+    def getbuffer(self):
+        """
+        Returns a memoryview on the whole movie, when it is rendered.
+        """
+        self.wait_for(self.size)
+        return memoryview(self.buffer)
+
+    def getvalue(self):
+        self.wait_for(self.size)
+        return bytes(self.buffer)
+
+
+def render_chunk(ind):
+    effect, checkpoints, bounds = render_job
+    effect.restore(checkpoints[ind])
+    effect.after_fork()
+    frame_size = effect.ctr.num_leds * effect.ctr.led_bytes
+    data = bytearray()
+    for i in range(bounds[ind], bounds[ind + 1]):
+        frame = pattern_bytes(effect.getnext())
+        assert len(frame) == frame_size, "Frame {} has {} bytes, not {}".format(
+            i, len(frame), frame_size
+        )
+        data += frame
+    return bytes(data)
+
+
+def render_parallel(effect, numframes, processes=None, chunks=None):
+    """
+    Renders a movie of the effect in several processes. Requires the fork
+    start method of multiprocessing, otherwise the movie is rendered serially.
+
+    :param effect: the Effect to render
+    :param int numframes: number of frames in the movie
+    :param int processes: number of processes, by default the number of cpus
+    :param int chunks: number of chunks to split the movie into, by default
+        the number of processes
+    :rtype: MovieSegment
+    """
+    global render_job
+    processes = processes or multiprocessing.cpu_count()
+    if processes < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        movie = RenderStream(effect, numframes)
+        return MovieSegment([movie.getbuffer()])
+    chunks = min(numframes, chunks or processes) or 1
+    bounds = [numframes * i // chunks for i in range(chunks + 1)]
+    if effect.seed is not None:
+        random.seed(effect.seed)
+    effect.reset(numframes)
+    checkpoints = []
+    for i in range(chunks):
+        checkpoints.append(effect.checkpoint())
+        if i < chunks - 1:
+            effect.fast_forward(bounds[i + 1] - bounds[i])
+    frame_size = effect.ctr.num_leds * effect.ctr.led_bytes
+    buffer = bytearray(numframes * frame_size)
+    render_job = (effect, checkpoints, bounds)
+    try:
+        pool = multiprocessing.get_context("fork").Pool(processes)
+        try:
+            for i, data in enumerate(pool.imap(render_chunk, range(chunks))):
+                buffer[bounds[i] * frame_size : bounds[i + 1] * frame_size] = data
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        render_job = None
+    return MovieSegment([memoryview(buffer)])
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+xled_plus.rtscheduler
+~~~~~~~~~~~~~~~~~~~~~
+
+Real time playback of effects driven by an asyncio event loop.
+
+RealtimeScheduler plays an Effect on its controller with the frames sent on
+a fixed schedule from a monotonic clock. The next frame is computed while
+the current frame is being sent, and if a frame is too late for its time
+slot the slot is dropped, so that playback keeps the requested pace instead
+of drifting. Each frame is copied before it is sent, so effects may update
+their pattern in place. If the effect raises an error, playback stops and
+the error is recorded. Timing statistics for the played frames are kept in 'stats',
+and in the FrameMetrics of the controller if it has one (see
+xled_plus.metrics).
+
+The scheduler only uses the ordinary reset()/getnext() interface of the
+effect, so all effects can be played with it. It is normally started with
+Effect.launch_rt(asynchronous=True), but the run() coroutine can also be
+awaited directly from an already running event loop.
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import collections
+import threading
+import time
+
+
+class FrameStats(object):
+    """
+    Timing statistics for real time frames. The latest 'history' values
+    of each timing are kept for computing means and maxima.
+    """
+
+    def __init__(self, history=100):
+        self.frames = 0
+        self.dropped = 0
+        self.late = 0
+        self.errors = 0
+        self.last_error = None
+        self.render_times = collections.deque(maxlen=history)
+        self.send_times = collections.deque(maxlen=history)
+        self.lateness = collections.deque(maxlen=history)
+
+    def summary(self):
+        """
+        Returns a dict with frame counts, and mean and max of the recent
+        render times, send times, and lateness relative the schedule (in seconds).
+
+        :rtype: dict
+        """
+        res = {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "late": self.late,
+            "errors": self.errors,
+        }
+        for name in ("render_times", "send_times", "lateness"):
+            vals = list(getattr(self, name))
+            res[name] = {
+                "mean": sum(vals) / len(vals) if vals else 0.0,
+                "max": max(vals) if vals else 0.0,
+            }
+        return res
+
+
+class RealtimeScheduler(object):
+    """
+    Plays an effect in real time on a fixed schedule.
+
+    :param ctr: the HighControlInterface to show the frames on
+    :param effect: the Effect to play, already reset for real time
+    :param fps: frames per second, defaults to the preferred fps of the effect
+    :param float tolerance: how late (as a fraction of the frame interval) a
+        frame may be before its time slot is dropped
+    """
+
+    def __init__(self, ctr, effect, fps=None, tolerance=0.5):
+        self.ctr = ctr
+        self.effect = effect
+        self.interval = 1.0 / (fps or effect.preferred_fps)
+        self.tolerance = tolerance
+        self.stats = FrameStats()
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        """
+        Starts playing in a background thread with its own event loop.
+        """
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run_in_thread)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run_in_thread(self):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.run())
+        finally:
+            loop.close()
+
+    def cancel(self):
+        """
+        Stops playing, and waits for the currently sent frame to finish.
+        """
+        self.stopped = True
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def render(self):
+        """
+        Computes the next frame, as a movie of its own since effects may
+        update the returned pattern in place while it is being sent.
+        Returns None, and stops playing, if the effect fails.
+        """
+        start = time.monotonic()
+        try:
+            frame = self.ctr.to_movie(self.effect.getnext())
+        except Exception as err:
+            self.stats.errors += 1
+            self.stats.last_error = err
+            self.stopped = True
+            return None
+        self.stats.render_times.append(time.monotonic() - start)
+        return frame
+
+    def send(self, frame):
+        start = time.monotonic()
+        self.ctr.show_rt_frame(frame)
+        self.stats.send_times.append(time.monotonic() - start)
+
+    async def run(self):
+        """
+        Coroutine playing the effect until cancel() is called.
+        """
+        loop = asyncio.get_running_loop()
+        frame = self.render()
+        nexttime = time.monotonic()
+        while not self.stopped:
+            delay = nexttime - time.monotonic()
+            if delay > 0.0:
+                await asyncio.sleep(delay)
+                if self.stopped:
+                    break
+            lateness = time.monotonic() - nexttime
+            self.stats.lateness.append(lateness)
+            if lateness > self.interval * 0.1:
+                # Ignore the small overshoot of sleep itself
+                self.stats.late += 1
+            metrics = self.ctr.metrics
+            if metrics is not None:
+                metrics.begin_frame(nexttime)
+                render_time = self.stats.render_times[-1]
+            sending = loop.run_in_executor(None, self.send, frame)
+            # Compute the next frame while this one is being sent
+            frame = self.render()
+            try:
+                await sending
+                self.stats.frames += 1
+            except Exception as err:
+                self.stats.errors += 1
+                self.stats.last_error = err
+            if metrics is not None:
+                metrics.end_frame(render=render_time)
+            nexttime += self.interval
+            overrun = time.monotonic() - nexttime
+            if overrun > self.interval * self.tolerance:
+                missed = int(overrun / self.interval) + 1
+                self.stats.dropped += missed
+                if metrics is not None:
+                    metrics.drop(missed)
+                nexttime += missed * self.interval
@@ -36,6 +36,8 @@ class WheelEffect(Effect):
         self.tm += 1
         return pat
 
-ctr = setup_control()
-cols = [hsl_color(0.3995, 1.0000, 0.6110), hsl_color(0.6609, 1.0000, 0.7104), hsl_color(0.1321, 1.0000, 0.6374), hsl_color(0.4466, 1.0000, 0.5911), hsl_color(0.0395, 1.0000, 0.5389)]
-WheelEffect(ctr, cols, 1, 0.3).launch_movie()
+
+if __name__ == '__main__':
+    ctr = setup_control()
+    cols = [hsl_color(0.3995, 1.0000, 0.6110), hsl_color(0.6609, 1.0000, 0.7104), hsl_color(0.1321, 1.0000, 0.6374), hsl_color(0.4466, 1.0000, 0.5911), hsl_color(0.0395, 1.0000, 0.5389)]
+    WheelEffect(ctr, cols, 1, 0.3).launch_movie()
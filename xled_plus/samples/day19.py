@@ -41,12 +41,14 @@ class RotatingStarScene(Scene):
     def getnext(self):
         pat1 = super(RotatingStarScene, self).getnext()
         hue = (0.875 + 0.5 * abs(0.5 - (float(self.time) / self.preferred_frames))) % 1.0
-        patbg = ctr.make_layout_pattern(lambda pos: hsl_color(hue, 1.0, max(0.0, 0.9 - (pos[0]**2+pos[1]**2))), style="centered")
+        patbg = self.ctr.make_layout_pattern(lambda pos: hsl_color(hue, 1.0, max(0.0, 0.9 - (pos[0]**2+pos[1]**2))), style="centered")
         vec = self.getoccupancy()
         pat = [pat1[i] if vec[i] else patbg[i] for i in range(self.ctr.num_leds)]
         self.time += 1
         return pat
 
-ctr = setup_control()
-ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
-RotatingStarScene(ctr).launch_movie()
+
+if __name__ == '__main__':
+    ctr = setup_control()
+    ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
+    RotatingStarScene(ctr).launch_movie()
@@ -57,6 +57,8 @@ class SoftKaleidoScene(MovingShapesScene):
         sumcol = tuple(map(lambda *args: max(0, min(255, int(round(sum(args) * maxbr / sumbr)))), *cols))
         return sumcol
 
-ctr = setup_control()
-ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
-SoftKaleidoScene(ctr, 5, random_hsl_color_func(light=0.0)).launch_movie()
+
+if __name__ == '__main__':
+    ctr = setup_control()
+    ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
+    SoftKaleidoScene(ctr, 5, random_hsl_color_func(light=0.0)).launch_movie()
@@ -81,6 +81,8 @@ class MoonScene(MovingShapesScene):
         pat = [pat1[i] if vec[i] else pat2[i] for i in range(self.ctr.num_leds)]
         return pat
 
-ctr = setup_control()
-ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
-MoonScene(ctr).launch_movie()
+
+if __name__ == '__main__':
+    ctr = setup_control()
+    ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
+    MoonScene(ctr).launch_movie()
@@ -113,11 +113,13 @@ class SnowingScene(MovingShapesScene):
     def getnext(self):
         pat1 = super(SnowingScene, self).getnext()
         hue = (0.78 + 0.44 * abs(0.5 - (float(self.time) / 160) % 1.0)) % 1.0
-        patbg = ctr.make_layout_pattern(lambda pos: hsl_color(hue, 1.0, -0.92), style="centered")
+        patbg = self.ctr.make_layout_pattern(lambda pos: hsl_color(hue, 1.0, -0.92), style="centered")
         vec = self.getoccupancy()
         pat = [pat1[i] if vec[i] else patbg[i] for i in range(self.ctr.num_leds)]
         return pat
 
-ctr = setup_control()
-ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
-SnowingScene(ctr).launch_movie()
+
+if __name__ == '__main__':
+    ctr = setup_control()
+    ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
+    SnowingScene(ctr).launch_movie()
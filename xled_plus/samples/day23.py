@@ -27,5 +27,7 @@ class Crystal(RotateEffect):
         pat1 = super(Crystal, self).getnext()
         return sprinkle_pattern(self.ctr, pat1, [self.white], self.nsparks)
 
-ctr = setup_control()
-Crystal(ctr).launch_movie()
+
+if __name__ == '__main__':
+    ctr = setup_control()
+    Crystal(ctr).launch_movie()
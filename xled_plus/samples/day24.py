@@ -40,8 +40,10 @@ class ChristmasBallsScene(MovingShapesScene):
         pat = [pat1[i] if vec[i] else patbg[i] for i in range(self.ctr.num_leds)]
         return pat
 
-ctr = setup_control()
-ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
-cols = [hsl_color(0.625, 1.0, -0.15), hsl_color(0.26, 1.0, -0.11), hsl_color(0.42, 1.0, -0.05), hsl_color(0.54, 1.0, -0.15)]
-# cols = [hsl_color(0.44, 1.0, -0.21), hsl_color(0.44, 1.0, 0.11), hsl_color(0.625, 1.0, -0.17), hsl_color(0.625, 1.0, 0.11)]
-ChristmasBallsScene(ctr, cols).launch_movie()
+
+if __name__ == '__main__':
+    ctr = setup_control()
+    ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
+    cols = [hsl_color(0.625, 1.0, -0.15), hsl_color(0.26, 1.0, -0.11), hsl_color(0.42, 1.0, -0.05), hsl_color(0.54, 1.0, -0.15)]
+    # cols = [hsl_color(0.44, 1.0, -0.21), hsl_color(0.44, 1.0, 0.11), hsl_color(0.625, 1.0, -0.17), hsl_color(0.625, 1.0, 0.11)]
+    ChristmasBallsScene(ctr, cols).launch_movie()
@@ -74,13 +74,14 @@ class MeanderingKaleidoScene(MovingShapesScene):
         sumcol = tuple(map(lambda *args: max(0, min(255, int(round(sum(args) * maxbr / sumbr)))), *cols))
         return sumcol
 
-ctr = setup_control()
-ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
-eff = MeanderingKaleidoScene(ctr, 6)
-oldmode = ctr.get_mode()["mode"]
-eff.launch_rt()
-print("Started continuous effect - press Return to stop it")
-input()
-eff.stop_rt()
-ctr.set_mode(oldmode)
 
+if __name__ == '__main__':
+    ctr = setup_control()
+    ctr.adjust_layout_aspect(1.0)  # How many times wider than high is the led installation?
+    eff = MeanderingKaleidoScene(ctr, 6)
+    oldmode = ctr.get_mode()["mode"]
+    eff.launch_rt()
+    print("Started continuous effect - press Return to stop it")
+    input()
+    eff.stop_rt()
+    ctr.set_mode(oldmode)
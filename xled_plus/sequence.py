@@ -69,12 +69,28 @@ class Sequence(Effect):
     def update(self, step):
         self.currpos += self.speed * step
 
+    def getcolors(self, coords):
+        cp = self.currpos
+        if self.dim == 3:
+            (vx, vy, vz) = self.vect
+            xs = [(vx * p[0] + vy * p[1] + vz * p[2] + cp) % 1.0 for p in coords]
+        elif self.dim == 2:
+            (vx, vy) = self.vect
+            xs = [(vx * p[0] + vy * p[1] + cp) % 1.0 for p in coords]
+        else:
+            vx = self.vect[0]
+            xs = [(vx * p[0] + cp) % 1.0 for p in coords]
+        return list(map(self.seqfunc, xs))
+
     def getnext(self):
         self.update(1.0 / self.preferred_fps)
-        return self.ctr.make_layout_pattern(
-            lambda pos: self.seqfunc((self.dot(self.vect, pos) + self.currpos) % 1.0),
-            style="centered",
-        )
+        return self.ctr.make_layout_batch_pattern(self.getcolors, style="centered")
+
+    def fast_forward(self, numframes):
+        if type(self).getnext != Sequence.getnext:
+            return super(Sequence, self).fast_forward(numframes)
+        for i in range(numframes):
+            self.update(1.0 / self.preferred_fps)
 
 
 class ColorSequence(Sequence):
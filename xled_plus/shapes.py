@@ -10,6 +10,7 @@ and circles, but also simple letters and numbers.
 """
 
 
+import bisect
 import math as m
 from random import random, gauss, uniform
 from copy import copy
@@ -22,12 +23,21 @@ from xled_plus.pattern import random_hsl_color_func, dimcolor
 
 
 class Scene(Effect):
+    cache_attrs = ("preferred_fps", "proj2D3D", "bgfunc")
+    # Set to True to only recompute the leds under moving or changing shapes,
+    # reusing the previous frame elsewhere. Requires that 'bgfunc' only
+    # depends on the led, not on time.
+    incremental = False
+
     def __init__(self, ctr):
         super(Scene, self).__init__(ctr)
         self.shapes = []
         self.occvec = [False] * ctr.num_leds
         self.bgfunc = False
         self.proj2D3D = False  # 'cylshell', 'cylbase', 'halfsphere' 
+        self.scene_coords = (False, False, False)
+        self.shape_grid = None  # ShapeGrid of the frame being rendered
+        self.last_frame = None  # Colors and shape boxes for incremental rendering
 
     def add_shape(self, sh):
         self.shapes.append(sh)
@@ -49,7 +59,9 @@ class Scene(Effect):
     def get_color(self, coord, ind):
         goaldepth = False
         colors = []
-        for sh in self.shapes:
+        # Only the shapes whose bounding box can contain the led, in the same order
+        shapes = self.shape_grid.lookup(coord) if self.shape_grid else None
+        for sh in self.shapes if shapes is None else shapes:
             if goaldepth and sh.depth != goaldepth:
                 break
             else:
@@ -64,24 +76,139 @@ class Scene(Effect):
     def reset(self, numframes):
         pass
 
+    def get_scene_coords(self):
+        # Led positions as seen by get_color, computed once per layout and projection
+        dim = self.ctr.get_layout_bounds()["dim"]
+        proj = self.proj2D3D if dim == 3 else False
+        if proj == "cylshell":
+            ledcoords = self.ctr.get_layout_coords("cylinder")
+        elif proj == "halfsphere":
+            ledcoords = self.ctr.get_layout_coords("halfsphere")
+        else:
+            ledcoords = self.ctr.get_layout_coords("centered")
+        if self.scene_coords[0] is ledcoords and self.scene_coords[1] == proj:
+            return self.scene_coords[2]
+        if proj == "cylbase":
+            fact = self.ctr.get_layout_bounds()["radius"] / self.ctr.get_layout_bounds()["cylradius"]
+            coords = [(pos[0]*fact, pos[2]*fact) for pos in ledcoords]
+        elif proj == "cylshell":
+            hyp = ((m.pi * self.ctr.get_layout_bounds()["cylradius"]) ** 2 + 0.25) ** 0.5
+            xfact = m.pi / 180.0 * self.ctr.get_layout_bounds()["cylradius"] / hyp
+            yfact = 1.0 / hyp
+            coords = [(pos[1]*xfact, (pos[2] - 0.5)*yfact) for pos in ledcoords]
+        elif proj == "halfsphere":
+            coords = [(m.sin(pos[1]*m.pi/180.0)*pos[2]/90.0, -m.cos(pos[1]*m.pi/180.0)*pos[2]/90.0) for pos in ledcoords]
+        else:
+            coords = ledcoords
+        self.scene_coords = (ledcoords, proj, coords)
+        return coords
+
+    def fill_shape_grid(self, coords):
+        # The grid over the led positions is kept as long as the coordinates,
+        # and filled with the shapes in their current positions every frame
+        if self.shape_grid is None or self.shape_grid.coords is not coords:
+            self.shape_grid = ShapeGrid(coords)
+        boxes = [shape_bbox(sh) for sh in self.shapes]
+        self.shape_grid.fill(self.shapes, boxes)
+        return boxes
+
+    def incremental_colors(self, coords, boxes):
+        # Only the leds under the shapes of this or the previous frame can
+        # have changed, provided that all shapes have bounding boxes
+        grid = self.shape_grid
+        if any(box is None or len(box) < grid.dim for box in boxes):
+            boxes = None
+        prev = self.last_frame
+        if (
+            prev is None
+            or prev[0] is not coords
+            or prev[1] != self.bgfunc
+            or prev[3] is None
+            or boxes is None
+            or type(self).get_color is not Scene.get_color
+        ):
+            colors = self.render_colors(coords, range(len(coords)), boxes)
+        else:
+            colors = prev[2]
+            inds = grid.leds_in(prev[3] + boxes)
+            for i, col in zip(inds, self.render_colors(coords, inds, boxes)):
+                colors[i] = col
+        self.last_frame = (coords, self.bgfunc, colors, boxes)
+        return colors
+
+    def can_batch(self):
+        # Shape by shape rendering gives the same result as get_color if
+        # all shapes have batch versions and no color functions that may
+        # depend on being called in led order
+        return type(self).get_color is Scene.get_color and all(
+            is_trusted(type(sh), "get_colors") and not callable(sh.color)
+            for sh in self.shapes
+        )
+
+    def render_colors(self, coords, inds, boxes):
+        """
+        Returns the colors of the leds with the given indices, computed
+        shape by shape with their get_colors if possible, or else led by led
+        with get_color.
+
+        :rtype: list
+        """
+        grid = self.shape_grid
+        grid.bin_leds()
+        # Leds outside the grid are only found by testing all shapes
+        if not self.can_batch() or grid.outside:
+            return [self.get_color(coords[i], i) for i in inds]
+        wanted = set(inds) if len(inds) < len(coords) else None
+        goal = {}
+        hits = {}
+        for sh, box in zip(self.shapes, boxes or [None] * len(self.shapes)):
+            if box is None or len(box) < grid.dim:
+                cand = inds
+            else:
+                cand = grid.leds_in([box])
+                if wanted is not None:
+                    cand = [i for i in cand if i in wanted]
+            # As get_color, skip shapes at other depths than the first hit
+            depth = sh.depth
+            cand = [i for i in cand if not goal.get(i) or goal[i] == depth]
+            for i, col in zip(cand, sh.get_colors(coords, cand)):
+                if col:
+                    if not goal.get(i):
+                        goal[i] = depth
+                    if i in hits:
+                        hits[i].append(col)
+                    else:
+                        hits[i] = [col]
+        res = []
+        for i in inds:
+            colors = hits.get(i)
+            self.occvec[i] = True if colors else False
+            res.append(
+                self.blend_colors(colors or [])
+                or (self.bgfunc(coords[i], i) if self.bgfunc else (0, 0, 0))
+            )
+        return res
+
     def getnext(self):
         self.update(1)
-        dim = self.ctr.get_layout_bounds()["dim"]
-        if dim == 3 and self.proj2D3D:
-            if self.proj2D3D == "cylbase":
-                fact = self.ctr.get_layout_bounds()["radius"] / self.ctr.get_layout_bounds()["cylradius"]
-                colfunc = lambda pos, ind: self.get_color((pos[0]*fact, pos[2]*fact), ind)
-                return self.ctr.make_layout_pattern(colfunc, style="centered", index=True)
-            elif self.proj2D3D == "cylshell":
-                hyp = ((m.pi * self.ctr.get_layout_bounds()["cylradius"]) ** 2 + 0.25) ** 0.5
-                xfact = m.pi / 180.0 * self.ctr.get_layout_bounds()["cylradius"] / hyp
-                yfact = 1.0 / hyp
-                colfunc = lambda pos, ind: self.get_color((pos[1]*xfact, (pos[2] - 0.5)*yfact), ind)
-                return self.ctr.make_layout_pattern(colfunc, style="cylinder", index=True)
-            elif self.proj2D3D == "halfsphere":
-                colfunc = lambda pos, ind: self.get_color((m.sin(pos[1]*m.pi/180.0)*pos[2]/90.0, -m.cos(pos[1]*m.pi/180.0)*pos[2]/90.0), ind)
-                return self.ctr.make_layout_pattern(colfunc, style="halfsphere", index=True)
-        return self.ctr.make_layout_pattern(self.get_color, style="centered", index=True)
+        coords = self.get_scene_coords()
+        boxes = self.fill_shape_grid(coords)
+        try:
+            if self.incremental:
+                colors = self.incremental_colors(coords, boxes)
+            else:
+                colors = self.render_colors(coords, range(len(coords)), boxes)
+            return self.ctr.make_func_pattern(lambda i: colors[i])
+        finally:
+            self.shape_grid.cells = None
+
+    def fast_forward(self, numframes):
+        # Only skip rendering when it can not draw random numbers, i.e with
+        # built-in shapes without color functions
+        if type(self).getnext != Scene.getnext or self.bgfunc or not self.can_batch():
+            return super(Scene, self).fast_forward(numframes)
+        for i in range(numframes):
+            self.update(1)
 
     def getoccupancy(self):
         return self.occvec
@@ -110,6 +237,156 @@ class Scene(Effect):
             return bounds["bounds"]
 
 
+class ShapeGrid(object):
+    """
+    Uniform grid over the (first two coordinates of the) led positions,
+    listing for each cell the shapes whose bounding box overlaps it. The
+    shapes in a cell keep their order in the scene, so the depth ordering is
+    the same as when testing all shapes.
+
+    :param coords: the led positions as seen by Scene.get_color
+    :param int leds_per_cell: approximate number of leds in each cell
+    """
+
+    def __init__(self, coords, leds_per_cell=4):
+        self.coords = coords
+        self.dim = min(2, len(coords[0])) if coords else 1
+        self.num = max(
+            1, int(round((len(coords) / float(leds_per_cell)) ** (1.0 / self.dim)))
+        )
+        self.lo = []
+        self.scale = []
+        for d in range(self.dim):
+            lo = min(c[d] for c in coords) if coords else 0.0
+            hi = max(c[d] for c in coords) if coords else 0.0
+            self.lo.append(lo)
+            self.scale.append(self.num / (hi - lo) if hi > lo else 0.0)
+        self.cells = None
+        self.members = None
+        self.outside = None
+
+    def box_cells(self, box):
+        """
+        Returns the indices of the cells overlapped by a bounding box, which
+        must have at least as many coordinates as the grid.
+        """
+        ranges = []
+        eps = 1e-9 * self.num  # Rounding as in cell_index
+        for d in range(self.dim):
+            i0 = (box[d][0] - self.lo[d]) * self.scale[d]
+            i1 = (box[d][1] - self.lo[d]) * self.scale[d]
+            if i1 < -eps or i0 > self.num + eps:
+                return []
+            first = max(0, min(self.num - 1, int(m.floor(i0))))
+            ranges.append(range(first, min(self.num - 1, int(i1)) + 1))
+        if self.dim == 1:
+            return ranges[0]
+        return [i * self.num + j for i in ranges[0] for j in ranges[1]]
+
+    def cell_index(self, coord):
+        ind = 0
+        eps = 1e-9 * self.num  # The highest coordinate may be rounded upwards
+        for d in range(self.dim):
+            x = (coord[d] - self.lo[d]) * self.scale[d]
+            if x < -eps or x > self.num + eps:
+                return None
+            ind = ind * self.num + max(0, min(int(x), self.num - 1))
+        return ind
+
+    def fill(self, shapes, boxes):
+        if len(shapes) < 2:
+            self.cells = None  # Not worth the lookup
+            return
+        self.cells = [[] for i in range(self.num ** self.dim)]
+        for sh, box in zip(shapes, boxes):
+            if box is None or len(box) < self.dim:
+                for cell in self.cells:
+                    cell.append(sh)
+            else:
+                for i in self.box_cells(box):
+                    self.cells[i].append(sh)
+
+    def lookup(self, coord):
+        """
+        Returns the shapes that may contain coord, or None if coord is
+        outside the grid, in which case all shapes have to be tested.
+        """
+        if self.cells is None:
+            return None
+        ind = self.cell_index(coord)
+        return None if ind is None else self.cells[ind]
+
+    def bin_leds(self):
+        """
+        Sorts the leds into the cells, once per grid. Leds outside the grid,
+        which should not happen, are listed in 'outside'.
+        """
+        if self.members is None:
+            self.members = [[] for i in range(self.num ** self.dim)]
+            self.outside = []
+            for i, coord in enumerate(self.coords):
+                ind = self.cell_index(coord)
+                if ind is None:
+                    self.outside.append(i)
+                else:
+                    self.members[ind].append(i)
+        return self.members
+
+    def leds_in(self, boxes):
+        """
+        Returns the sorted indices of the leds in the cells overlapped by any
+        of the bounding boxes, and of any leds outside the grid.
+
+        :rtype: list
+        """
+        members = self.bin_leds()
+        marked = set()
+        for box in boxes:
+            marked.update(self.box_cells(box))
+        res = list(self.outside)
+        for i in marked:
+            res.extend(members[i])
+        res.sort()
+        return res
+
+
+def defining_class(cls, name):
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return klass
+    return None
+
+
+trusted_methods = {}
+
+
+def is_trusted(cls, name):
+    """
+    Tells if the method 'name' of a shape class, which bounds or batches
+    is_inside and get_color, can be used. It is only trusted if defined at
+    least as far down the class hierarchy as is_inside and get_color, so that
+    subclasses changing them, e.g Fireball in samples/day31a.py, are
+    handled one led at a time.
+    """
+    key = (cls, name)
+    trusted = trusted_methods.get(key)
+    if trusted is None:
+        methcls = defining_class(cls, name)
+        bounded = [defining_class(cls, meth) for meth in ("is_inside", "get_color")]
+        trusted = methcls is not None and all(
+            klass is None or issubclass(methcls, klass) for klass in bounded
+        )
+        trusted_methods[key] = trusted
+    return trusted
+
+
+def shape_bbox(sh):
+    """
+    Returns the bounding box of the shape, or None if it is unknown.
+    """
+    return sh.bbox() if is_trusted(type(sh), "bbox") else None
+
+
 class Shape(object):
     def __init__(self, cent, angle):
         self.depth = 0
@@ -122,6 +399,48 @@ class Shape(object):
     def is_inside(self, coord):
         pass
 
+    def bbox(self):
+        """
+        Returns the bounding box of the shape in its current position, as a
+        list of (min, max) for each coordinate, or None if unknown, in which
+        case the shape is tested at every led.
+        """
+        return None
+
+    def radius_bbox(self, rad):
+        return [(c - rad, c + rad) for c in self.cent]
+
+    def get_colors(self, coords, inds):
+        """
+        Returns the colors (or False) of the shape at the leds with the given
+        indices, as a list in the same order. Subclasses override this with
+        batch versions giving exactly the same result as get_color.
+
+        :param coords: the positions of all leds
+        :param inds: the indices of the leds to get colors for
+        :rtype: list
+        """
+        return [self.get_color(coords[i], i) for i in inds]
+
+    def inside_colors(self, coords, inds, inside):
+        # The colors for the leds where inside is true
+        if callable(self.color):
+            return [self.color(coords[i], i) if ins else False for i, ins in zip(inds, inside)]
+        return [self.color if ins else False for ins in inside]
+
+    def offsets(self, coords, inds):
+        # The differences cent - coord, and distances, for the leds
+        if len(self.cent) == 2 and coords and len(coords[0]) >= 2:
+            (cx, cy) = self.cent
+            dps = [(cx - coords[i][0], cy - coords[i][1]) for i in inds]
+            return dps, [m.sqrt(dx ** 2 + dy ** 2) for (dx, dy) in dps]
+        if len(self.cent) == 3 and coords and len(coords[0]) == 3:
+            (cx, cy, cz) = self.cent
+            dps = [(cx - coords[i][0], cy - coords[i][1], cz - coords[i][2]) for i in inds]
+            return dps, [m.sqrt(dx ** 2 + dy ** 2 + dz ** 2) for (dx, dy, dz) in dps]
+        dps = [tuple(map(lambda x1, x2: (x1 - x2), self.cent, coords[i])) for i in inds]
+        return dps, [m.sqrt(sum([d ** 2 for d in dp])) for dp in dps]
+
     def get_color(self, coord, ind):
         if self.is_inside(coord):
             return self.color(coord, ind) if callable(self.color) else self.color
@@ -153,6 +472,9 @@ class Blob(Shape):
             sum(map(lambda x1, x2: (x1 - x2) ** 2, self.cent, coord)) <= self.rad ** 2
         )
 
+    def bbox(self):
+        return self.radius_bbox(self.rad)
+
     def get_color(self, coord, ind):
         dist = (
             m.sqrt(sum(map(lambda x1, x2: (x1 - x2) ** 2, self.cent, coord))) / self.rad
@@ -163,6 +485,18 @@ class Blob(Shape):
             col = self.color(coord, ind) if callable(self.color) else self.color
             return dimcolor(col, 1.0 - dist)
 
+    def get_colors(self, coords, inds):
+        rad = self.rad
+        res = []
+        for i, dist in zip(inds, self.offsets(coords, inds)[1]):
+            dist = dist / rad
+            if dist > 1.0:
+                res.append(False)
+            else:
+                col = self.color(coords[i], i) if callable(self.color) else self.color
+                res.append(dimcolor(col, 1.0 - dist))
+        return res
+
 
 class Polygon(Shape):
     def __init__(self, num, cent, angle, smallrad, col):
@@ -173,6 +507,9 @@ class Polygon(Shape):
         self.rad2 = smallrad / m.cos(m.pi / num)
         self.color = col
 
+    def bbox(self):
+        return self.radius_bbox(self.rad2)
+
     def is_inside(self, coord):
         dist = m.sqrt(sum(map(lambda x1, x2: (x1 - x2) ** 2, self.cent, coord)))
         if dist > self.rad2:
@@ -186,6 +523,20 @@ class Polygon(Shape):
             ) - m.pi / self.num
             return dist <= self.rad1 / m.cos(ang)
 
+    def get_colors(self, coords, inds):
+        (rad1, rad2, angle) = (self.rad1, self.rad2, self.angle)
+        (half, full) = (m.pi / self.num, 2 * m.pi / self.num)
+        inside = []
+        for dp, dist in zip(*self.offsets(coords, inds)):
+            if dist > rad2:
+                inside.append(False)
+            elif dist <= rad1:
+                inside.append(True)
+            else:
+                ang = (angle + m.atan2(dp[0], -dp[1]) + half) % full - half
+                inside.append(dist <= rad1 / m.cos(ang))
+        return self.inside_colors(coords, inds, inside)
+
 
 class Ellipse(Shape):
     def __init__(self, cent, angle, largerad, smallrad, col):
@@ -194,6 +545,9 @@ class Ellipse(Shape):
         self.rad2 = largerad
         self.color = col
 
+    def bbox(self):
+        return self.radius_bbox(self.rad2)
+
     def is_inside(self, coord):
         dist = m.sqrt(sum(map(lambda x1, x2: (x1 - x2) ** 2, self.cent, coord)))
         if dist > self.rad2:
@@ -207,6 +561,22 @@ class Ellipse(Shape):
                 (self.rad1 * m.cos(ang)) ** 2 + (self.rad2 * m.sin(ang)) ** 2
             )
 
+    def get_colors(self, coords, inds):
+        (rad1, rad2, angle) = (self.rad1, self.rad2, self.angle)
+        prod = rad1 * rad2
+        inside = []
+        for dp, dist in zip(*self.offsets(coords, inds)):
+            if dist > rad2:
+                inside.append(False)
+            elif dist <= rad1:
+                inside.append(True)
+            else:
+                ang = -angle + m.atan2(dp[0], dp[1])
+                inside.append(
+                    dist <= prod / m.sqrt((rad1 * m.cos(ang)) ** 2 + (rad2 * m.sin(ang)) ** 2)
+                )
+        return self.inside_colors(coords, inds, inside)
+
 
 class Star(Shape):
     def __init__(self, num, cent, angle, largerad, smallrad, col):
@@ -224,6 +594,9 @@ class Star(Shape):
         )
         self.rad0 = smallrad * m.cos(self.ang0)
 
+    def bbox(self):
+        return self.radius_bbox(self.rad2)
+
     def is_inside(self, coord):
         dist = m.sqrt(sum(map(lambda x1, x2: (x1 - x2) ** 2, self.cent, coord)))
         if dist > self.rad2:
@@ -238,6 +611,20 @@ class Star(Shape):
             )
             return dist <= self.rad0 / m.cos(ang + self.ang0)
 
+    def get_colors(self, coords, inds):
+        (rad0, rad1, rad2, ang0, angle) = (self.rad0, self.rad1, self.rad2, self.ang0, self.angle)
+        (half, full) = (m.pi / self.num, 2 * m.pi / self.num)
+        inside = []
+        for dp, dist in zip(*self.offsets(coords, inds)):
+            if dist > rad2:
+                inside.append(False)
+            elif dist <= rad1:
+                inside.append(True)
+            else:
+                ang = abs((-angle + m.atan2(dp[0], dp[1])) % full - half)
+                inside.append(dist <= rad0 / m.cos(ang + ang0))
+        return self.inside_colors(coords, inds, inside)
+
 
 # Tänk ett antal punkter med linjer eller arcs mellan
 # Vidare en standardstorlek och linjevidd, som kan skalas och få en riktning
@@ -341,6 +728,21 @@ class Lineart2D(Shape):
             (off[0] + coord[0]) * mat[1][0] + (off[1] + coord[1]) * mat[1][1],
         ]
 
+    def bbox(self):
+        # The extent corners transformed back from the local coordinates
+        ((a, b), (c, d)) = self.mat
+        det = a * d - b * c
+        if det == 0.0:
+            return None
+        hw = self.lw * 0.5
+        xs = []
+        ys = []
+        for px in (self.extent[0] - hw, self.extent[2] + hw):
+            for py in (self.extent[1] - hw, self.extent[3] + hw):
+                xs.append((d * px - b * py) / det - self.off[0])
+                ys.append((a * py - c * px) / det - self.off[1])
+        return [(min(xs), max(xs)), (min(ys), max(ys))]
+
     def is_inside(self, coord):
         # global transform
         # jämför extent
@@ -353,6 +755,22 @@ class Lineart2D(Shape):
             or pp[1] > self.extent[3] + self.lw * 0.5
         ):
             return False
+        return self.near_segments(pp)
+
+    def get_colors(self, coords, inds):
+        (off, mat) = (self.off, self.mat)
+        (x0, y0) = (self.extent[0] - self.lw * 0.5, self.extent[1] - self.lw * 0.5)
+        (x1, y1) = (self.extent[2] + self.lw * 0.5, self.extent[3] + self.lw * 0.5)
+        inside = []
+        for i in inds:
+            pp = self.trans(coords[i], off, mat)
+            inside.append(
+                not (pp[0] < x0 or pp[1] < y0 or pp[0] > x1 or pp[1] > y1)
+                and self.near_segments(pp)
+            )
+        return self.inside_colors(coords, inds, inside)
+
+    def near_segments(self, pp):
         for seg in self.points:
             p0 = [pp[0] + seg[0], pp[1] + seg[1]]
             if p0[0] * p0[0] + p0[1] * p0[1] <= self.lw * self.lw / 4:
@@ -620,6 +1038,100 @@ class Letter(Lineart2D):
         self.change_angle(step * self.torque)
 
 
+glyph_rasters = {}
+
+
+def rasterize_glyph(char, lw, res):
+    """
+    Returns the coverage raster of the Letter for char with line width lw,
+    with res cells per letter height, as a tuple of the raster (a bytearray
+    row by row), its number of columns and rows, the lower edge of the raster
+    and the width of the letter when set in a text, in letter heights.
+    """
+    key = (char, lw, res)
+    if key not in glyph_rasters:
+        letter = Letter(char, (0.0, 0.0), 0, 1.0, None)
+        letter.lw = lw
+        (x0, y0) = (letter.extent[0] - lw * 0.5, letter.extent[1] - lw * 0.5)
+        ncols = int(m.ceil((letter.extent[2] + lw * 0.5 - x0) * res))
+        nrows = int(m.ceil((letter.extent[3] + lw * 0.5 - y0) * res))
+        raster = bytearray(
+            letter.is_inside((x0 + (c + 0.5) / res, y0 + (r + 0.5) / res))
+            for r in range(nrows)
+            for c in range(ncols)
+        )
+        width = max(0.4, letter.extent[2] - letter.extent[0] + 2 * lw)
+        glyph_rasters[key] = (raster, ncols, nrows, y0, width)
+    return glyph_rasters[key]
+
+
+class TextStrip(Shape):
+    """
+    A line of text in the same letters as Letter, rasterized once into a
+    coverage strip which is sampled at each led. Moving the text is then as
+    cheap as moving any simple shape, also for long texts, at the price of
+    letter edges that are exact only to a raster cell.
+
+    :param str txt: the text
+    :param pos: the left end of the base line of the text
+    :param float size: the height of the letters
+    :param colors: list with the color of each letter
+    :param float lw: the line width relative the letter height
+    :param int res: raster cells per letter height
+    """
+
+    def __init__(self, txt, pos, size, colors, lw=0.1, res=64):
+        super(TextStrip, self).__init__(pos, 0.0)
+        self.size = size
+        self.colors = colors
+        self.res = res
+        self.scale = res / float(size)
+        self.glyphs = [rasterize_glyph(ch, lw, res) for ch in txt]
+        self.widths = [glyph[4] for glyph in self.glyphs]
+        self.lefts = []
+        x = 0.0
+        for wdt in self.widths:
+            self.lefts.append(x)
+            x += wdt * size
+        self.length = x
+        self.ylims = (
+            min([0.0] + [glyph[3] * size for glyph in self.glyphs]),
+            max([0.0] + [(glyph[3] + glyph[2] / float(res)) * size for glyph in self.glyphs]),
+        )
+
+    def letter_at(self, coord):
+        # The index of the letter covering coord, or -1
+        sx = coord[0] - self.cent[0]
+        k = bisect.bisect_right(self.lefts, sx) - 1
+        if k < 0:
+            return -1
+        (raster, ncols, nrows, y0, wdt) = self.glyphs[k]
+        col = int((sx - self.lefts[k]) * self.scale)
+        rowf = ((coord[1] - self.cent[1]) / self.size - y0) * self.res
+        if col < ncols and 0.0 <= rowf < nrows and raster[int(rowf) * ncols + col]:
+            return k
+        return -1
+
+    def is_inside(self, coord):
+        return self.letter_at(coord) >= 0
+
+    def bbox(self):
+        return [
+            (self.cent[0], self.cent[0] + self.length),
+            (self.cent[1] + self.ylims[0], self.cent[1] + self.ylims[1]),
+        ]
+
+    def get_color(self, coord, ind):
+        k = self.letter_at(coord)
+        if k < 0:
+            return False
+        col = self.colors[k]
+        return col(coord, ind) if callable(col) else col
+
+    def get_colors(self, coords, inds):
+        return [self.get_color(coords[i], i) for i in inds]
+
+
 # Example scenes
 
 
@@ -760,6 +1272,11 @@ class MovingShapesScene(Scene):
 
 
 class RunningText(MovingShapesScene):
+    # Set to False to test the line art of each letter at each led instead
+    # of sampling a rasterized TextStrip. The rasterized letter edges are
+    # exact only to a raster cell, so some leds at the edges differ.
+    rasterize = True
+
     def __init__(self, ctr, txt, color, linewidth=0.1, size=0.6, speed=1.0):
         super(RunningText, self).__init__(ctr)
         self.textcolor = color
@@ -777,6 +1294,14 @@ class RunningText(MovingShapesScene):
         self.place_text()
         self.preferred_frames = self.nsteps
         
+    def letter_color(self, ind):
+        if isinstance(self.textcolor, list):
+            return self.textcolor[ind % len(self.textcolor)]
+        elif callable(self.textcolor):
+            return self.textcolor(ind)
+        else:
+            return self.textcolor
+
     def place_text(self):
         bounds = self.get_scene_bounds()
         # Size is relative the total height of leds, convert to relative radius
@@ -787,20 +1312,22 @@ class RunningText(MovingShapesScene):
         self.endx = bounds[0][0]
         self.liney = -size / 2.0
         self.shapes = []
-        for ind, ch in enumerate(self.txt):
-            if isinstance(self.textcolor, list):
-                col = self.textcolor[ind % len(self.textcolor)]
-            elif callable(self.textcolor):
-                col = self.textcolor(ind)
-            else:
-                col = self.textcolor
-            sh = Letter(ch, (0, self.liney), 0, size, col)
-            sh.lw = self.lw
-            sh.off[0] = -self.currx + (sh.extent[0] - sh.lw * 0.5) * size
+        if self.rasterize:
+            colors = [self.letter_color(ind) for ind in range(len(self.txt))]
+            sh = TextStrip(self.txt, (self.currx, self.liney), size, colors, self.lw)
             sh.set_speed(-speed, 0.0)
-            wdt = max(0.4, sh.extent[2] - sh.extent[0] + 2 * sh.lw)
-            self.currx += wdt * size
+            for wdt in sh.widths:
+                self.currx += wdt * size
             self.add_shape(sh)
+        else:
+            for ind, ch in enumerate(self.txt):
+                sh = Letter(ch, (0, self.liney), 0, size, self.letter_color(ind))
+                sh.lw = self.lw
+                sh.off[0] = -self.currx + (sh.extent[0] - sh.lw * 0.5) * size
+                sh.set_speed(-speed, 0.0)
+                wdt = max(0.4, sh.extent[2] - sh.extent[0] + 2 * sh.lw)
+                self.currx += wdt * size
+                self.add_shape(sh)
         self.nsteps = int(round((self.currx - self.endx) / speed + 0.5))
         self.time = 0
 
@@ -809,11 +1336,40 @@ class RunningText(MovingShapesScene):
             self.place_text()
 
     def update(self, step):
+        if self.time >= self.nsteps:
+            # Start over when played in real time, as a movie would
+            self.place_text()
         for sh in self.shapes:
             sh.update(step)
         self.time += step
 
 
+def realtime_option(argv):
+    """
+    Removes "--rt" from the command line arguments argv, and tells if it
+    was given, for scripts showing a RunningText (see show_running_text).
+    """
+    realtime = "--rt" in argv
+    while "--rt" in argv:
+        argv.remove("--rt")
+    return realtime
+
+
+def show_running_text(eff, realtime=False):
+    """
+    Shows a RunningText as a movie uploaded to the device, or if realtime is
+    True, played in real time until Return is pressed. The latter allows
+    texts too long to fit in the movie memory of the device.
+    """
+    if realtime:
+        eff.launch_rt()
+        print("Showing text in real time - press Return to stop it")
+        input()
+        eff.stop_rt()
+    else:
+        eff.launch_movie()
+
+
 class CaleidoScene(MovingShapesScene):
     def __init__(self, ctr, sym):
         super(CaleidoScene, self).__init__(ctr)
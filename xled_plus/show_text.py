@@ -12,6 +12,8 @@ def makecolorlist(n):
     gs = (1.25**0.5 - 0.5)
     return [hsl_color((0.5 + gs * i) % 1.0, 1.0, 0.0) for i in range(n)]
 
+realtime = realtime_option(argv)
+
 if len(argv) == 3 and isipaddress(argv[1]):
     host = argv[1]
     txt = argv[2]
@@ -22,10 +24,10 @@ elif len(argv) == 2:
     txt = argv[1]
     host = discover().ip_address
 else:
-    print('Usage: python -m xled_plus.show_text [ip-address] "text"')
+    print('Usage: python -m xled_plus.show_text [--rt] [ip-address] "text"')
     quit()
 
 ctr = HighControlInterface(host)
 ctr.adjust_layout_aspect(1.0)
 eff = RunningText(ctr, txt.upper(), makecolorlist(len(txt)), size=0.6, speed=0.5)
-eff.launch_movie()
+show_running_text(eff, realtime)
@@ -1,4 +1,4 @@
-# usage: python -m show_text <text> <aspect_ratio> <name_of_device>
+# usage: python -m show_text [--rt] <text> <aspect_ratio> <name_of_device>
 
 from xled_plus.discoverall import *
 from xled_plus.highcontrol import HighControlInterface
@@ -15,8 +15,10 @@ def makecolorlist(n):
     gs = (1.25**0.5 - 0.5)
     return [hsl_color((0.5 + gs * i) % 1.0, 1.0, 0.0) for i in range(n)]
 
+realtime = realtime_option(argv)
+
 if len(argv) == 1:
-    print("Usage: python -m xled_plus.show_text <text> [<aspect_ratio>] [<device_name_or_ip>]")
+    print("Usage: python -m xled_plus.show_text [--rt] <text> [<aspect_ratio>] [<device_name_or_ip>]")
     exit()
 
 if len(argv) == 4:
@@ -51,4 +53,4 @@ else:
 
 ctr.adjust_layout_aspect(aspect)
 eff = RunningText(ctr, txt.upper(), makecolorlist(len(txt)), size=0.6, speed=0.5)
-eff.launch_movie()
+show_running_text(eff, realtime)
@@ -32,9 +32,12 @@ import sys
 
 
 class PictureEffect(Effect):
+    shared_state = ("ctr", "im")
+
     def __init__(self, ctr, fname, fit='stretch'):
         # fit can be: 'stretch', 'small', 'large', 'medium'
         super(PictureEffect, self).__init__(ctr)
+        self.fname = fname
         self.im = Image.open(fname)
         self.xmid = (self.im.size[0]-1) / 2.0
         self.ymid = (self.im.size[1]-1) / 2.0
@@ -60,14 +63,21 @@ class PictureEffect(Effect):
         else:
             self.preferred_fps = 1
             self.preferred_frames = 1
+        self.imcoords = (False, False)
 
-    def get_color(self, pos):
+    def get_imcoord(self, pos):
         coord = (int(round((pos[0] - 0.5) * self.xscale + self.xmid)),
                  int(round((0.5 - pos[1]) * self.yscale + self.ymid)))
         if coord[0] >= 0 and coord[0] < self.im.size[0] and coord[1] >= 0 and coord[1] < self.im.size[1]:
+            return coord
+        else:
+            return False
+
+    def get_pixel_color(self, coord, palette=None):
+        if coord:
             if self.im.mode == 'P':
                 pix = self.im.getpixel(coord)
-                rgb = self.im.getpalette()[pix*3:pix*3+3]
+                rgb = (palette or self.im.getpalette())[pix*3:pix*3+3]
             elif self.im.mode == 'L':
                 rgb = [self.im.getpixel(coord)] * 3
             else:
@@ -76,6 +86,16 @@ class PictureEffect(Effect):
             rgb = (0, 0, 0)
         return image_to_led_rgb(*rgb)
 
+    def get_color(self, pos):
+        return self.get_pixel_color(self.get_imcoord(pos))
+
+    def get_colors(self, coords):
+        # The picture coordinates of the leds only change with the layout
+        if self.imcoords[0] is not coords:
+            self.imcoords = (coords, [self.get_imcoord(pos) for pos in coords])
+        palette = self.im.getpalette() if self.im.mode == 'P' else None
+        return [self.get_pixel_color(coord, palette) for coord in self.imcoords[1]]
+
     def reset(self, numframes):
         self.index = -1
 
@@ -83,7 +103,17 @@ class PictureEffect(Effect):
         if "is_animated" in dir(self.im) and self.im.is_animated:
             self.index += 1
             self.im.seek(self.index % self.im.n_frames)
-        return self.ctr.make_layout_pattern(self.get_color, style="square")
+        return self.ctr.make_layout_batch_pattern(self.get_colors, style="square")
+
+    def fast_forward(self, numframes):
+        if type(self).getnext != PictureEffect.getnext:
+            return super(PictureEffect, self).fast_forward(numframes)
+        if "is_animated" in dir(self.im) and self.im.is_animated:
+            self.index += numframes
+
+    def after_fork(self):
+        # Do not share the file position with other processes
+        self.im = Image.open(self.fname)
 
 
 if __name__ == '__main__' and len(sys.argv) > 1: